@@ -5,11 +5,16 @@ from unit_manager import UnitManager
 from task_manager import TaskManager
 from tactics import Tactics
 from environment import EnvironmentModel
-from utils import init_debug, debug
+from profiler import Profiler
+from budget import TimeBudget, DeadlineExceeded
+from utils import init_debug, flush_debug, Logger
+
+log = Logger("agent")
 
 class Agent:  
 
-  def __init__(self, player: str, env_cfg):
+  def __init__(self, player: str, env_cfg, budget_enabled=None):
+    # budget_enabled=False plays without the turn time budget, None follows LUX_BUDGET
     init_debug()
     self.team_id = 0 if player == "player_0" else 1
     self.opp_team_id = 1 if self.team_id == 0 else 0
@@ -18,18 +23,34 @@ class Agent:
     self.taskman = TaskManager(self, env_cfg)
     self.tactics = Tactics(self, env_cfg)
     self.strategy = Strategy(self, env_cfg)
+    self.profiler = Profiler(player)
+    self.budget = TimeBudget((self.env.max_steps_in_match + 1) * self.env.max_matches, budget_enabled)
     self.tot_time = 0
+    self.overrun = None # hard deadline hit this turn
 
   def update(self, obs, step):
-    self.env.update(obs, step)
-    self.unitman.update(obs)
-    self.taskman.update(obs)
-    self.tactics.update(obs)
-    self.strategy.update(obs)
+    prof = self.profiler
+    with prof.timing("env"):
+      self.env.update(obs, step)
+    with prof.timing("unitman"):
+      self.unitman.update(obs)
+    with prof.timing("taskman"):
+      self.taskman.update(obs)
+    with prof.timing("tactics"):
+      self.tactics.update(obs)
+    with prof.timing("strategy"):
+      self.strategy.update(obs)
 
   def actions(self):
     live_units = self.unitman.live_units()
-    self.taskman.assign_tasks(live_units)
+    try:
+      with self.profiler.timing("assign"):
+        self.taskman.assign_tasks(live_units)
+    except DeadlineExceeded as e:
+      # planning overran the hard deadline, fall back to last turn plans for units not assigned yet
+      self.overrun = str(e)
+      log.warning("step {} overrun: {}\n", self.env.step, self.overrun)
+      self.taskman.fallback_tasks(live_units)
     actions = dict()
     for uid in self.unitman.live_units():
       actions[uid] = self.unitman.my_unit(uid).action()
@@ -37,16 +58,23 @@ class Agent:
     return actions
 
   def act(self, step: int, obs, remainingOverageTime: int = 60):
-    debug(f"Step {step}. Time {int(self.tot_time)} / {remainingOverageTime}\n")
+    log.info("Step {}. Time {} / {}\n", step, int(self.tot_time), remainingOverageTime)
     self.time = remainingOverageTime
+    self.overrun = None
     tstart = time.time()
-    self.update(obs, step)
-    actions = np.zeros((self.env.max_units, 3), dtype=int)
-    if not self.env.is_last_step(0): # skip last step
-      unit_actions = self.actions()
-      for uid in unit_actions:
-        actions[uid] = unit_actions[uid]
-    tend = time.time()
-    debug(f"time={tend - tstart}\n")
-    self.tot_time += (tend - tstart)
+    self.budget.start_turn(step, remainingOverageTime)
+    try:
+      self.update(obs, step)
+      self.budget.set_decisive(self.strategy.decisive())
+      actions = np.zeros((self.env.max_units, 3), dtype=int)
+      if not self.env.is_last_step(0): # skip last step
+        unit_actions = self.actions()
+        for uid in unit_actions:
+          actions[uid] = unit_actions[uid]
+      tend = time.time()
+      log.info("time={}\n", tend - tstart)
+      self.tot_time += (tend - tstart)
+      self.profiler.end_turn(step, tend - tstart, self.taskman.counters, self.taskman.unit_counters, self.budget.budget, self.overrun)
+    finally:
+      flush_debug() # buffered lines of a failing turn are written too
     return actions
@@ -0,0 +1,53 @@
+import os, time
+
+class DeadlineExceeded(Exception):
+  pass
+
+class TimeBudget:
+  # splits remaining overage time over the remaining turns of the episode, planning shrinks when the turn budget runs low
+  # disabled with enabled=False or LUX_BUDGET=off: no hard deadline and full search on every turn, so the actions do not
+  # depend on wall clock time (replays, lockstep comparisons, tests)
+
+  act_timeout = 2.0 # per turn time not charged to overage, kept below the runner limit
+  reserve = 5.0 # overage seconds never planned with
+  decisive_factor = 4 # overage share multiplier on decisive turns
+  hard_factor = 2 # hard deadline as multiple of the turn budget
+
+  def __init__(self, nsteps, enabled=None):
+    self.nsteps = nsteps
+    self.enabled = os.environ.get("LUX_BUDGET", "on").lower() != "off" if enabled is None else enabled
+    self.tstart = time.perf_counter()
+    self.share = 0 # overage seconds this turn may use
+    self.spare = 0 # overage seconds above reserve
+    self.overruns = 0
+    self._set_budget(0)
+
+  def _set_budget(self, share):
+    self.budget = self.act_timeout + min(share, self.spare)
+    self.hard_limit = min(self.budget * self.hard_factor, self.act_timeout + self.spare)
+    self.deadline = self.tstart + self.hard_limit
+
+  def start_turn(self, step, remaining):
+    self.tstart = time.perf_counter()
+    self.spare = max(0.0, remaining - self.reserve)
+    self.share = self.spare / max(1, self.nsteps - step)
+    self._set_budget(self.share)
+
+  def set_decisive(self, decisive):
+    # spend more of the overage on turns deciding a match
+    self._set_budget(self.share * self.decisive_factor if decisive else self.share)
+
+  def elapsed(self):
+    return time.perf_counter() - self.tstart
+
+  def left(self):
+    return self.budget - self.elapsed() if self.enabled else float("inf")
+
+  def fraction_left(self):
+    return self.left() / self.budget if self.enabled else 1.0
+
+  def check(self, where):
+    # cooperative hard deadline, called from planning loops
+    if self.enabled and time.perf_counter() > self.deadline:
+      self.overruns += 1
+      raise DeadlineExceeded(f"{where} after {self.elapsed():.3f}s (limit {self.hard_limit:.3f}s)")
@@ -1,26 +1,36 @@
 import numpy as np
-from utils import debug, mirror
+from history import History
+from utils import Logger, mirror, mirror_grid
+
+log = Logger("env")
 
 class Tile:
 
+  UNKNOWN = -1
   EMPTY = 0
   NEBULA = 1
   ASTEROID = 2
 
-  def __init__(self, pos, energy, status, step):
-    self.pos = pos
-    self.energy = int(energy)
-    self.status = int(status)
-    self.step = step
-  
-  def empty(self):
-    return self.status == Tile.EMPTY
-  
-  def passable(self):
-    return self.status != Tile.ASTEROID
+class FeatureReconstructor:
+  # step-0 features under every drift hypothesis, kept up to date while drift is unknown
+
+  def __init__(self, env):
+    self.env = env
+    speeds = [ s for s in env.nebula_drift_speed_options if s > 0 ] # detected speed is always positive
+    self.features = { (s, d): np.full((env.W, env.H), Tile.UNKNOWN, dtype=np.int8) for s in speeds for d in [ "upright", "downleft" ] }
+
+  def observe(self, step, types, visible):
+    for drift, features in self.features.items():
+      types0 = self.env._rewind_grid(types, step + 1, drift=drift)
+      visible0 = self.env._rewind_grid(visible, step + 1, drift=drift)
+      self.env._mirrored_set(features, types0, visible0)
+
+  def reconstruct(self, drift):
+    return self.features[drift].copy()
 
 class EnvironmentModel:
   # constants
+  FR_NONE = -2 # outside of relic areas
   FR_ABSENT = -1
   FR_UNKNOWN = 0
   FR_CONFIRMED = 1
@@ -66,27 +76,37 @@ class EnvironmentModel:
     self.unit_sap_range = env_cfg["unit_sap_range"]
     self.max_steps_in_match = env_cfg["max_steps_in_match"]
     self.max_matches = env_cfg["match_count_per_episode"]
-    debug(f"env unit params: mc={self.unit_move_cost} sc={self.unit_sap_cost} sr={self.unit_sap_range}\n")
-    self.observations = [] # sets of visible tiles at each step
+    log.info("env unit params: mc={} sc={} sr={}\n", self.unit_move_cost, self.unit_sap_cost, self.unit_sap_range)
+    self.history_len = 8
+    self.observations = History(self.history_len, types=((self.W, self.H), np.int8), energies=((self.W, self.H), np.int16),
+                                visible=((self.W, self.H), bool)) # visible map at last steps
     self.relic_steps = [] # steps of relic discovery
     self.relics = set() # pos of relics
-    self.fragments = dict() # pos in relic area -> known status
-    self.features = dict() # reconstruction of asteroids at step 0 
-    self.nebula = dict() # reconstruction of nebula at step 0
+    self.fragments = np.full((self.W, self.H), self.FR_NONE, dtype=np.int8) # known status of tiles in relic areas
+    self._fragment_sets = None # cached fragment masks and positions, reset on status change
+    self.features = np.full((self.W, self.H), Tile.UNKNOWN, dtype=np.int8) # reconstruction of asteroids and nebula at step 0
     self.last_drift_step = 1 # step of last drift detected 
-    self.discovered = dict() # pos -> tile as last seen
+    self.reconstructor = FeatureReconstructor(self)
+    # map as last seen
+    self.tile_energies = np.zeros((self.W, self.H), dtype=np.int16)
+    self.tile_steps = np.full((self.W, self.H), -1, dtype=np.int16) # -1 for never seen
+    self.visible = np.zeros((self.W, self.H), dtype=bool)
     self.drift_detected = False 
+    # terrain forecast for the next steps
+    self.forecast_horizon = self.max_steps_in_match + 2 # search doesn't plan past the end of the match
+    self._forecast_drift = None
+    self._forecast_features = None
+    self._update_forecast()
+    self._update_energy_forecast()
 
   def update(self, obs, step):
     self.step = step
-    tiles = self._visible_tiles(obs)
-    self.observations.append(tiles)
-    for tpos, tile in tiles.items():
-      self.discovered[tpos] = tile
-      self.discovered[mirror(tpos)] = tile
+    self._observe(obs)
+    if not self.drift_speed_known:
+      self.reconstructor.observe(self.step, self.observations.latest("types"), self.visible)
     # relics
-    relic_nodes = np.array(obs["relic_nodes"]) # shape (max_relic_nodes, 2)
-    observed_relic_nodes_mask = np.array(obs["relic_nodes_mask"]) # shape (max_relic_nodes, )
+    relic_nodes = np.asarray(obs["relic_nodes"]) # shape (max_relic_nodes, 2)
+    observed_relic_nodes_mask = np.asarray(obs["relic_nodes_mask"]) # shape (max_relic_nodes, )
     visible_relic_node_ids = set(np.where(observed_relic_nodes_mask)[0])
     for id in visible_relic_node_ids:
       rpos = int(relic_nodes[id][0]), int(relic_nodes[id][1])
@@ -101,117 +121,159 @@ class EnvironmentModel:
       self._infere_drift()
     # update features mask
     self._update_features()
+    self._update_forecast()
     # infer energy node drift speed
     if not self.endrift_speed_known:
       self._infere_endrift()
+    self._update_energy_forecast()
+
+  def _observe(self, obs):
+    self.visible = np.array(obs["sensor_mask"], dtype=bool)
+    types = np.where(self.visible, obs["map_features"]["tile_type"], Tile.UNKNOWN).astype(np.int8)
+    energies = np.where(self.visible, obs["map_features"]["energy"], 0).astype(np.int16)
+    self.observations.push(self.step, types=types, energies=energies, visible=self.visible)
+    self._mirrored_set(self.tile_energies, energies, self.visible)
+    self._mirrored_set(self.tile_steps, np.full_like(self.tile_steps, self.step), self.visible)
 
-  def _visible_tiles(self, obs):
-    tiles = dict() # pos -> tile
-    visible = np.array(obs["sensor_mask"])
-    mapfeats = obs["map_features"]["tile_type"]
-    mapenergy = obs["map_features"]["energy"]
-    for x in range(self.W):
-      for y in range(self.H):
-        if visible[x][y]:
-          tiles[x, y] = Tile((x, y), mapenergy[x][y], mapfeats[x][y], self.step)
-    return tiles
+  def _mirrored_set(self, grid, values, mask):
+    mmask = mirror_grid(mask)
+    grid[mmask] = mirror_grid(values)[mmask]
+    grid[mask] = values[mask]
 
   def _infere_drift(self):
     if len(self.observations) < 2:
       return
-    previous = self.observations[-2]
-    current = self.observations[-1]
-    changed = set()
-    for tpos in previous:
-      if tpos in current and current[tpos].status != previous[tpos].status:
-          changed.add(tpos)
-    if len(changed) == 0:
+    previous, current = self.observations.last("types", 2)
+    pvisible, cvisible = self.observations.last("visible", 2)
+    changed = pvisible & cvisible & (previous != current)
+    if not changed.any():
       return
     drift_diff = self.step - self.last_drift_step
     self.last_drift_step = self.step
     drift_speed = 1.0 / drift_diff
-    drift_speed = min(self.nebula_drift_speed_options, key=lambda o: abs(o-drift_speed))
-    debug(f"drift speed {drift_speed}\n")
-    upright, downleft = 0, 0
-    for tpos in changed:
-      x, y, = tpos
-      urpos = (x+1) % self.W, (y+self.H-1) % self.H
-      if urpos in changed:
-        if previous[urpos].status == Tile.EMPTY and current[urpos].status != Tile.EMPTY and current[urpos].status == previous[tpos].status:
-          upright += 1 # asteroid or nebula moved on empty up-right tile 
-        if previous[urpos].status != Tile.EMPTY and current[urpos].status == Tile.EMPTY and current[tpos].status == previous[urpos].status:
-          downleft += 1 # asteroid or nebula moved on empty up-right tile 
-      dlpos = (x+self.W-1) % self.W, (y+1) % self.H
-      if dlpos in changed:
-        if previous[dlpos].status == Tile.EMPTY and current[dlpos].status != Tile.EMPTY and current[dlpos].status == previous[tpos].status:
-          downleft += 1 # asteroid or nebula moved on empty down-left tile 
-        if previous[dlpos].status != Tile.EMPTY and current[dlpos].status == Tile.EMPTY and current[tpos].status == previous[dlpos].status:
-          upright += 1 # asteroid or nebula moved on empty up-right tile 
-    debug(f"drift dir {upright} {downleft}\n")
+    drift_speed = self.nebula_drift_speed_options[int(np.argmin(np.abs(np.array(self.nebula_drift_speed_options) - drift_speed)))]
+    log.debug("drift speed {}\n", drift_speed)
+    # neighbours of each tile along both drift diagonals
+    ur = lambda grid: np.roll(grid, (-1, 1), axis=(0, 1)) # (x+1, y-1)
+    dl = lambda grid: np.roll(grid, (1, -1), axis=(0, 1)) # (x-1, y+1)
+    empty_p, empty_c = previous == Tile.EMPTY, current == Tile.EMPTY
+    # asteroid or nebula moved on empty up-right / down-left tile 
+    to_ur = changed & ur(changed) & ur(empty_p) & ~ur(empty_c) & (ur(current) == previous)
+    from_ur = changed & ur(changed) & ~ur(empty_p) & ur(empty_c) & (current == ur(previous))
+    to_dl = changed & dl(changed) & dl(empty_p) & ~dl(empty_c) & (dl(current) == previous)
+    from_dl = changed & dl(changed) & ~dl(empty_p) & dl(empty_c) & (current == dl(previous))
+    upright = int(to_ur.sum() + from_dl.sum())
+    downleft = int(from_ur.sum() + to_dl.sum())
+    log.debug("drift dir {} {}\n", upright, downleft)
     if upright > downleft:
       self.drift_speed, self.drift_speed_known = (drift_speed, "upright"), True
-      debug(f"drift {self.drift_speed}\n")
+      log.info("drift {}\n", self.drift_speed)
       self._reconstruct_features()
-    if upright < downleft:
+    elif upright < downleft:
       self.drift_speed, self.drift_speed_known = (drift_speed, "downleft"), True
-      debug(f"drift {self.drift_speed}\n")
+      log.info("drift {}\n", self.drift_speed)
       self._reconstruct_features()
-    self.features = dict() # reset features for detected unknown drift
+    else:
+      self.features[:] = Tile.UNKNOWN # reset features for detected unknown drift
     self.drift_detected = True # skip ner estimation
 
   def _infere_endrift(self):
     if self.step <= 10 or self.step > 100 or len(self.observations) < 2:
       return
-    previous = self.observations[-2]
-    current = self.observations[-1]
-    for tpos in previous:
-      if tpos in current and current[tpos].energy != previous[tpos].energy:
-        self.endrift_speed = round(1.0 / (self.step - 2), 2)
-        debug(f"enode speed {self.endrift_speed}\n")
-        self.endrift_speed_known = True
-        return
+    previous, current = self.observations.last("energies", 2)
+    pvisible, cvisible = self.observations.last("visible", 2)
+    if (pvisible & cvisible & (previous != current)).any():
+      self.endrift_speed = round(1.0 / (self.step - 2), 2)
+      log.info("enode speed {}\n", self.endrift_speed)
+      self.endrift_speed_known = True
 
   def _update_features(self):
-    for tpos, tile in self.observations[-1].items():
-      tpos = self._rewind_drift(tpos, self.step + 1)
-      self.features[tpos] = tile.status
-      self.features[mirror(tpos)] = tile.status
+    types = self.observations.latest("types")
+    self._mirrored_set(self.features, self._rewind_grid(types, self.step + 1), self._rewind_grid(self.visible, self.step + 1))
 
   def _reconstruct_features(self):
-    for step, tiles in enumerate(self.observations):
-      for tpos, tile in tiles.items():
-        tpos = self._rewind_drift(tpos, step + 1)
-        self.features[tpos] = tile.status
-        self.features[mirror(tpos)] = tile.status
+    self.features = self.reconstructor.reconstruct(self.drift_speed)
+    self.reconstructor = None # drift won't change anymore
+
+  def _ndrifts(self, step, drift=None):
+    if drift is None:
+      if not self.drift_speed_known:
+        return 0
+      drift = self.drift_speed
+    return int((step-2) * drift[0])
 
   def _rewind_drift(self, tpos, step, show=False):
     if not self.drift_speed_known:
       return tpos
-    dspeed, ddir = self.drift_speed
-    ndrifts = int((step-2) * dspeed)
+    ndrifts = self._ndrifts(step)
     if show:
-      debug(f"{step} {ndrifts}\n")
+      log.debug("{} {}\n", step, ndrifts)
     x, y, = tpos
-    if ddir == "upright":
+    if self.drift_speed[1] == "upright":
       return (x+10*self.W-ndrifts) % self.W, (y+ndrifts) % self.H
     else:
       return (x+ndrifts) % self.W, (y+10*self.H-ndrifts) % self.H
 
+  def _rewind_grid(self, grid, step, forward=False, drift=None):
+    if drift is None:
+      if not self.drift_speed_known:
+        return grid
+      drift = self.drift_speed
+    ndrifts = -self._ndrifts(step, drift) if forward else self._ndrifts(step, drift)
+    if drift[1] == "upright":
+      return np.roll(grid, (-ndrifts, ndrifts), axis=(0, 1))
+    else:
+      return np.roll(grid, (ndrifts, -ndrifts), axis=(0, 1))
+
+  def _update_forecast(self):
+    # features drifted to each of the next steps, rolled once per distinct drift offset
+    drift = self.drift_speed if self.drift_speed_known else None
+    if drift != self._forecast_drift or not np.array_equal(self.features, self._forecast_features):
+      self._forecast_drift, self._forecast_features = drift, self.features.copy()
+      self._drifted = dict() # ndrifts -> features at that offset
+    steps = range(self.step, self.step + self.forecast_horizon + 1)
+    for step in steps:
+      if self._ndrifts(step) not in self._drifted:
+        self._drifted[self._ndrifts(step)] = self._rewind_grid(self.features, step, forward=True)
+    cube = np.stack([ self._drifted[self._ndrifts(step)] for step in steps ])
+    self.passable_cube = cube[:-1] != Tile.ASTEROID # dstep -> passable at step + dstep
+    self.nebula_cube = cube[1:] == Tile.NEBULA # dstep -> nebula at step + 1 + dstep
+
+  def _update_energy_forecast(self):
+    # tile energy and move cost at each of the next steps, rebuilt each turn and when energy estimates change
+    energy = self.tile_energies[None, :, :]
+    if self.endrift_speed_known:
+      dsteps = np.arange(self.forecast_horizon)[:, None, None]
+      stale = (self.tile_steps >= 0) & (self.step + dsteps - self.tile_steps > int(1.0 / self.endrift_speed))
+      energy = np.where(stale, 0, energy)
+    self.energy_cube = (energy - self.nebula_enred * self.nebula_cube).astype(np.int16) # dstep -> tot tile energy
+    self.cost_cube = self.unit_move_cost - self.energy_cube # dstep -> energy cost of moving on tile
+
   def _update_fragments(self, rpos):
     rx, ry = rpos
-    debug(f"new relic at {(rx, ry)}\n")
-    for dx in range(-(self.relic_config_size // 2), self.relic_config_size // 2 + 1):
-      for dy in range(-(self.relic_config_size // 2), self.relic_config_size // 2 + 1):
-        fpos = rx+dx, ry+dy
-        if self.on_map(fpos) and not self.is_confirmed_fragment(fpos):
-          self.fragments[fpos] = self.FR_UNKNOWN
-          self.fragments[mirror(fpos)] = self.FR_UNKNOWN
+    log.info("new relic at {}\n", (rx, ry))
+    d = self.relic_config_size // 2
+    area = np.zeros((self.W, self.H), dtype=bool)
+    area[max(0, rx-d):rx+d+1, max(0, ry-d):ry+d+1] = True
+    self._set_fragments(area & (self.fragments != self.FR_CONFIRMED), self.FR_UNKNOWN)
+
+  def _set_fragments(self, mask, status):
+    mask = mask | mirror_grid(mask)
+    if (self.fragments[mask] != status).any():
+      self.fragments[mask] = status
+      self._fragment_sets = None
+
+  def _positions_mask(self, positions):
+    mask = np.zeros((self.W, self.H), dtype=bool)
+    for pos in positions:
+      mask[pos] = True
+    return mask
 
   def __repr__(self):
     s = "Features map 0:\n"
     for y in range(self.H):
       for x in range(self.W):
-        if (x,y) in self.features:
+        if self.features[x,y] != Tile.UNKNOWN:
           s += str(self.features[x,y]) + " "
         else:
           s += ". "
@@ -232,7 +294,7 @@ class EnvironmentModel:
     s = "Fragments map:\n"
     for y in range(self.H):
       for x in range(self.W):
-        if (x,y) not in self.fragments:
+        if self.fragments[x,y] == self.FR_NONE:
           s += ". "
         elif self.fragments[x,y] == self.FR_ABSENT:
           s += "A "
@@ -266,49 +328,87 @@ class EnvironmentModel:
     return step // 101
 
   def is_fragment(self, p):
-    return p in self.fragments and self.fragments[p] != self.FR_ABSENT
+    return self.fragments[p] >= self.FR_UNKNOWN
 
   def is_confirmed_fragment(self, p):
-    return p in self.fragments and self.fragments[p] == self.FR_CONFIRMED
+    return self.fragments[p] == self.FR_CONFIRMED
 
   def is_unknown_fragment(self, p):
-    return p in self.fragments and self.fragments[p] == self.FR_UNKNOWN
+    return self.fragments[p] == self.FR_UNKNOWN
+
+  def _fragment_index(self):
+    if self._fragment_sets is None:
+      fragments = self.fragments >= self.FR_UNKNOWN
+      confirmed = self.fragments == self.FR_CONFIRMED
+      self._fragment_sets = {
+        "all": fragments,
+        "confirmed": confirmed,
+        "all_pos": { (x, y) for x, y in np.argwhere(fragments).tolist() },
+        "confirmed_pos": { (x, y) for x, y in np.argwhere(confirmed).tolist() },
+      }
+    return self._fragment_sets
+
+  def fragments_mask(self):
+    return self._fragment_index()["all"]
+
+  def confirmed_mask(self):
+    return self._fragment_index()["confirmed"]
 
   def nfragments(self):
-    return sum(1 for p in self.fragments if self.is_fragment(p))
+    return len(self._fragment_index()["all_pos"])
 
-  def all_fragments(self):
-    return set(p for p in self.fragments if self.fragments[p] != self.FR_ABSENT)
+  def all_fragments(self): # cached, don't modify
+    return self._fragment_index()["all_pos"]
 
-  def confirmed_fragments(self):
-    return { p for p in self.fragments if self.is_confirmed_fragment(p) }
+  def confirmed_fragments(self): # cached, don't modify
+    return self._fragment_index()["confirmed_pos"]
 
   def tile_energy(self, pos):
-    return self.discovered[pos].energy if pos in self.discovered else 0
+    return int(self.tile_energies[pos])
   
   def passable(self, pos, dstep):
+    if dstep < self.forecast_horizon:
+      return self.passable_cube[dstep, pos[0], pos[1]]
     tpos = self._rewind_drift(pos, self.step + dstep)
-    return tpos not in self.features or self.features[tpos] != Tile.ASTEROID
+    return self.features[tpos] != Tile.ASTEROID
 
   def is_nebula(self, pos, dstep):
+    if dstep < self.forecast_horizon:
+      return self.nebula_cube[dstep, pos[0], pos[1]]
     tpos = self._rewind_drift(pos, self.step + 1 + dstep)
-    return tpos in self.features and self.features[tpos] == Tile.NEBULA
+    return self.features[tpos] == Tile.NEBULA
 
   def tot_tile_energy(self, pos, dstep):
+    if dstep < self.forecast_horizon:
+      return int(self.energy_cube[dstep, pos[0], pos[1]])
     if self.endrift_speed_known and self.is_enode_change(pos, dstep):
       return 0 - (self.nebula_enred if self.is_nebula(pos, dstep) else 0)
     else:
       return self.tile_energy(pos) - (self.nebula_enred if self.is_nebula(pos, dstep) else 0)
 
+  def tot_energy_grid(self, dstep):
+    return self.energy_cube[dstep]
+
+  def move_cost(self, pos, dstep):
+    if dstep < self.forecast_horizon:
+      return int(self.cost_cube[dstep, pos[0], pos[1]])
+    return self.unit_move_cost - self.tot_tile_energy(pos, dstep)
+
   def is_last_nebula_tile(self, pos):
     tpos = self._rewind_drift(pos, self.step)
-    return tpos in self.features and self.features[tpos] == Tile.NEBULA
+    return self.features[tpos] == Tile.NEBULA
+
+  def last_nebula_mask(self):
+    return self._rewind_grid(self.features, self.step, forward=True) == Tile.NEBULA
 
   def is_visible(self, pos):
-    return pos in self.observations[-1]
+    return self.visible[pos]
+
+  def is_discovered(self, pos):
+    return self.tile_steps[pos] >= 0
 
   def last_seen(self, pos):
-    return 0 if pos not in self.discovered else self.discovered[pos].step    
+    return max(0, int(self.tile_steps[pos]))
 
   def is_last_step(self, dstep):
     return (self.step + dstep) in { 101, 202, 303, 404, 505 }
@@ -317,32 +417,38 @@ class EnvironmentModel:
     return self.step in { 102, 203, 304, 405 }
 
   def is_enode_change(self, pos, dstep):
-    if pos not in self.discovered:
+    if not self.is_discovered(pos):
       return False
-    step1, step2 = self.discovered[pos].step, self.step + dstep
+    step1, step2 = int(self.tile_steps[pos]), self.step + dstep
     return (step2-step1) > int(1.0 / self.endrift_speed)
 
   def set_sensor_range(self, sr):
     if sr in self.unit_sensor_range_options and sr > self.unit_sensor_range:
       self.unit_sensor_range, self.unit_sr_known = sr, self.step > 100
-      debug(f"vis estimated: {sr}\n")  
+      log.info("vis estimated: {}\n", sr)
 
-  def set_nebula_energy_reduction(self, ner):
-    if ner in self.nebula_energy_reduction_options:
+  def set_nebula_energy_reduction(self, ners):
+    # first of observed reductions that is an option
+    match = np.isin(ners, self.nebula_energy_reduction_options)
+    if match.any():
+      ner = int(ners[np.argmax(match)])
       self.nebula_enred, self.nebula_enred_known = ner, True
-      debug(f"ner estimated: {ner}\n")  
-
-  def set_sap_dropoff(self, denergy, nsaps):
-    for o in self.unit_sap_dropoff_options:
-      if -denergy == int(self.unit_sap_cost*o*nsaps):
-        self.unit_sap_dropoff_factor, self.unit_sdoff_known = o, True
-        debug(f"sdo estimated: {o}\n")  
+      log.info("ner estimated: {}\n", ner)
+      self._update_energy_forecast()
+
+  def set_sap_dropoff(self, denergies, nsaps):
+    # last option matching the energy loss of the last unit with any match
+    expected = (self.unit_sap_cost * np.array(self.unit_sap_dropoff_options)[None, :] * np.asarray(nsaps)[:, None]).astype(int)
+    match = np.flatnonzero(-np.asarray(denergies)[:, None] == expected)
+    if len(match) > 0:
+      o = self.unit_sap_dropoff_options[match[-1] % len(self.unit_sap_dropoff_options)]
+      self.unit_sap_dropoff_factor, self.unit_sdoff_known = o, True
+      log.info("sdo estimated: {}\n", o)
 
   def absent_fragments(self):
     covered = { unit.pos for unit in self.agent.unitman.all_visible_units(self.agent.team_id) if unit.energy >= 0 } # dying units don't get points
-    for pos in covered:
-      self.fragments[pos] = self.FR_ABSENT
-      self.fragments[mirror(pos)] = self.FR_ABSENT
+    # only fragment tiles change, covered tiles outside relic areas stay FR_NONE and keep the cached sets
+    self._set_fragments(self._positions_mask(covered) & (self.fragments >= self.FR_UNKNOWN), self.FR_ABSENT)
 
   def confirm_fragments(self, reward):
     covered_fragments = { unit.pos for unit in self.agent.unitman.all_visible_units(self.agent.team_id) 
@@ -352,16 +458,14 @@ class EnvironmentModel:
     unkreward = reward - len(confirmed)
     if len(unknown) > 0:
       if unkreward == len(unknown):
+        self._set_fragments(self._positions_mask(unknown), self.FR_CONFIRMED)
         for pos in unknown:
-          self.fragments[pos] = self.FR_CONFIRMED
-          self.fragments[mirror(pos)] = self.FR_CONFIRMED
-          debug(f"frg confirmed {pos} \n")
+          log.info("frg confirmed {} \n", pos)
       elif unkreward == 0:
+        self._set_fragments(self._positions_mask(unknown), self.FR_ABSENT)
         for pos in unknown:
-          self.fragments[pos] = self.FR_ABSENT
-          self.fragments[mirror(pos)] = self.FR_ABSENT
-          debug(f"frg absent {pos} \n")
+          log.info("frg absent {} \n", pos)
       else:
-        debug(f"frg abandon\n")        
+        log.info("frg abandon\n")
         return True
     return False
\ No newline at end of file
@@ -0,0 +1,107 @@
+import os, sys, json
+import numpy as np
+from main import from_json
+from recorder import load_recording
+
+# episode directory: meta.json { player, env_cfg, nsteps } and one <column>.npy per field with a leading step axis
+# columns load with np.load(mmap_mode="r"), turns are read as views without decoding JSON
+# usage: python episode_store.py recording.jsonl.gz episode_dir
+
+obs_columns = { # column -> (observation keys, dtype), shape is taken from the first observation
+  "units_position": (("units", "position"), np.int8),
+  "units_energy": (("units", "energy"), np.int16),
+  "units_mask": (("units_mask",), np.bool_),
+  "sensor_mask": (("sensor_mask",), np.bool_),
+  "map_energy": (("map_features", "energy"), np.int8),
+  "map_tile_type": (("map_features", "tile_type"), np.int8),
+  "relic_nodes": (("relic_nodes",), np.int8),
+  "relic_nodes_mask": (("relic_nodes_mask",), np.bool_),
+  "team_points": (("team_points",), np.int32),
+  "team_wins": (("team_wins",), np.int32),
+  "steps": (("steps",), np.int32),
+  "match_steps": (("match_steps",), np.int32),
+}
+turn_columns = { "step": np.int32, "remaining": np.float64, "actions": np.int16 } # agent_fn inputs and output
+
+def _get(obs, keys):
+  for k in keys:
+    obs = obs[k]
+  return obs
+
+class EpisodeWriter:
+  # collects turns into preallocated columns, written on close
+
+  def __init__(self, directory, player, env_cfg, capacity=505):
+    self.directory = directory
+    self.meta = dict(player=player, env_cfg=env_cfg)
+    self.capacity = capacity
+    self.columns = None
+    self.count = 0
+
+  def _allocate(self, obs, actions):
+    self.columns = dict()
+    for name, (keys, dtype) in obs_columns.items():
+      self.columns[name] = np.zeros((self.capacity,) + np.shape(_get(obs, keys)), dtype=dtype)
+    for name, dtype in turn_columns.items():
+      self.columns[name] = np.zeros((self.capacity,) + (np.shape(actions) if name == "actions" else ()), dtype=dtype)
+
+  def append(self, step, obs, remaining, actions):
+    if self.columns is None:
+      self._allocate(obs, actions)
+    i = self.count
+    for name, (keys, dtype) in obs_columns.items():
+      self.columns[name][i] = _get(obs, keys)
+    self.columns["step"][i] = step
+    self.columns["remaining"][i] = remaining
+    self.columns["actions"][i] = actions
+    self.count += 1
+
+  def close(self):
+    os.makedirs(self.directory, exist_ok=True)
+    for name, column in (self.columns or dict()).items():
+      np.save(os.path.join(self.directory, f"{name}.npy"), column[:self.count])
+    with open(os.path.join(self.directory, "meta.json"), "wt") as fd:
+      json.dump(dict(self.meta, nsteps=self.count), fd)
+
+class Episode:
+  # memory mapped episode columns
+
+  def __init__(self, directory):
+    with open(os.path.join(directory, "meta.json")) as fd:
+      meta = json.load(fd)
+    self.player = meta["player"]
+    self.env_cfg = meta["env_cfg"]
+    self.nsteps = meta["nsteps"]
+    self.columns = { name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in list(obs_columns) + list(turn_columns) } if self.nsteps > 0 else dict()
+
+  def __len__(self):
+    return self.nsteps
+
+  def obs(self, i):
+    # observation of turn i in from_json layout, arrays are read only views
+    obs = dict()
+    for name, (keys, _) in obs_columns.items():
+      column = self.columns[name]
+      value = column[i].item() if column.ndim == 1 else column[i]
+      d = obs
+      for k in keys[:-1]:
+        d = d.setdefault(k, dict())
+      d[keys[-1]] = value
+    return obs
+
+  def turns(self):
+    # (step, obs, remainingOverageTime, actions) per turn
+    for i in range(self.nsteps):
+      yield self.columns["step"][i].item(), self.obs(i), self.columns["remaining"][i].item(), self.columns["actions"][i]
+
+def convert_recording(path, directory):
+  player, env_cfg, records = load_recording(path)
+  writer = EpisodeWriter(directory, player, env_cfg, max(1, len(records)))
+  for r in records:
+    writer.append(r["step"], from_json(r["obs"]), r["remainingOverageTime"], r["actions"])
+  writer.close()
+  return writer.count
+
+if __name__ == "__main__":
+  n = convert_recording(sys.argv[1], sys.argv[2])
+  print(f"{sys.argv[2]}: {n} steps")
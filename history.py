@@ -0,0 +1,46 @@
+import numpy as np
+
+class History:
+  # fixed capacity ring buffer of per-step array snapshots, memory stays flat over the episode
+
+  def __init__(self, capacity, **fields): # fields: name -> (shape, dtype)
+    self.capacity = capacity
+    self.steps = np.full(capacity, -1, dtype=np.int32)
+    self.data = { name: np.zeros((capacity,) + tuple(shape), dtype=dtype) for name, (shape, dtype) in fields.items() }
+    self.count = 0 # snapshots pushed since last clear
+
+  def __len__(self):
+    return min(self.count, self.capacity)
+
+  def clear(self):
+    self.count = 0
+    self.steps[:] = -1
+
+  def push(self, step, **values):
+    i = self.count % self.capacity
+    self.steps[i] = step
+    for name, value in values.items():
+      self.data[name][i] = value
+    self.count += 1
+
+  def _slots(self, k):
+    k = min(k, len(self))
+    return np.arange(self.count - k, self.count) % self.capacity
+
+  def latest(self, name, back=0):
+    # snapshot taken back steps before the last one
+    if back >= len(self):
+      raise IndexError(f"history holds {len(self)} snapshots")
+    return self.data[name][(self.count - 1 - back) % self.capacity]
+
+  def last(self, name, k):
+    # last k snapshots, oldest first
+    return self.data[name][self._slots(k)]
+
+  def last_steps(self, k):
+    return self.steps[self._slots(k)]
+
+  def since(self, name, step):
+    # snapshots taken at step or later, oldest first
+    slots = self._slots(self.capacity)
+    return self.data[name][slots[self.steps[slots] >= step]]
@@ -1,11 +1,14 @@
 import json
 from typing import Dict
 import sys
+import os
 from argparse import Namespace
 
 import numpy as np
 
 from agent import Agent
+from recorder import Recorder
+from observation import ObservationView, loads
 # from lux.config import EnvConfig
 def to_json(obj):
     if isinstance(obj, np.ndarray):
@@ -36,6 +39,8 @@ def from_json(state):
 ### DO NOT REMOVE THE FOLLOWING CODE ###
 agent_dict = dict() # store potentially multiple dictionaries as kaggle imports code directly
 agent_prev_obs = dict()
+recorders = dict() # player -> Recorder when LUX_RECORD names a directory
+obs_views = dict() # player -> ObservationView reused every turn
 def agent_fn(observation, configurations):
     """
     agent definition for kaggle submission.
@@ -43,14 +48,19 @@ def agent_fn(observation, configurations):
     global agent_dict
     obs = observation.obs
     if type(obs) == str:
-        obs = json.loads(obs)
+        obs = loads(obs)
     step = observation.step
     player = observation.player
     remainingOverageTime = observation.remainingOverageTime
     if step == 0:
         agent_dict[player] = Agent(player, configurations["env_cfg"])
+        if os.environ.get("LUX_RECORD"):
+            recorders[player] = Recorder(os.environ["LUX_RECORD"], player, to_json(configurations["env_cfg"]))
+        obs_views[player] = ObservationView()
     agent = agent_dict[player]
-    actions = agent.act(step, from_json(obs), remainingOverageTime)
+    actions = agent.act(step, obs_views[player].reset(obs), remainingOverageTime)
+    if player in recorders:
+        recorders[player].record(step, to_json(obs), remainingOverageTime, actions.tolist())
     return dict(action=actions.tolist())
 if __name__ == "__main__":
     
@@ -68,7 +78,7 @@ if __name__ == "__main__":
     i = 0
     while True:
         inputs = read_input()
-        raw_input = json.loads(inputs)
+        raw_input = loads(inputs)
         observation = Namespace(**dict(step=raw_input["step"], obs=raw_input["obs"], remainingOverageTime=raw_input["remainingOverageTime"], player=raw_input["player"], info=raw_input["info"]))
         if i == 0:
             env_cfg = raw_input["info"]["env_cfg"]
@@ -0,0 +1,74 @@
+import json
+import numpy as np
+
+try:
+  import orjson # faster parser when installed
+  loads = orjson.loads
+except ImportError:
+  loads = json.loads
+
+obs_dtypes = { # field -> buffer dtype, nested like the observation
+  "units": { "position": np.int16, "energy": np.int16 },
+  "units_mask": np.bool_,
+  "sensor_mask": np.bool_,
+  "map_features": { "energy": np.int16, "tile_type": np.int8 },
+  "relic_nodes": np.int16,
+  "relic_nodes_mask": np.bool_,
+  "team_points": np.int64,
+  "team_wins": np.int64,
+}
+
+def _shape(value):
+  if isinstance(value, np.ndarray):
+    return value.shape
+  shape = []
+  while isinstance(value, list):
+    shape.append(len(value))
+    value = value[0] if len(value) > 0 else None
+  return tuple(shape)
+
+class ObservationView:
+  # parsed JSON observation with obs["units"]["position"] style access, list fields are decoded on first access
+  # into typed buffers that are reused on the next turn, so arrays are only valid until the next reset
+  # numpy array fields (episode store columns) are copied into the same buffers, scalars pass through
+
+  def __init__(self, dtypes=obs_dtypes):
+    self.dtypes = dtypes
+    self.raw = dict()
+    self.buffers = dict() # field -> array
+    self.views = dict() # field -> nested ObservationView
+    self.decoded = set() # fields decoded since reset
+
+  def reset(self, raw):
+    self.raw = raw
+    self.decoded.clear()
+    for key, view in self.views.items():
+      if key in raw:
+        view.reset(raw[key])
+    return self
+
+  def __contains__(self, key):
+    return key in self.raw
+
+  def __getitem__(self, key):
+    value = self.raw[key]
+    if isinstance(value, dict):
+      if key not in self.views:
+        self.views[key] = ObservationView(self.dtypes.get(key, dict())).reset(value)
+      return self.views[key]
+    if not isinstance(value, (list, np.ndarray)):
+      return value
+    if key not in self.dtypes:
+      return np.array(value)
+    buffer = self.buffers.get(key)
+    if key not in self.decoded:
+      shape = _shape(value)
+      if buffer is None or buffer.shape != shape:
+        buffer = np.empty(shape, dtype=self.dtypes[key])
+        self.buffers[key] = buffer
+      buffer[...] = value
+      self.decoded.add(key)
+    return buffer
+
+  def get(self, key, default=None):
+    return self[key] if key in self.raw else default
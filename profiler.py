@@ -0,0 +1,38 @@
+import os, time, json
+
+class Profiler:
+  # per turn wall time of agent subsystems and search counters, written as one JSON line per turn to the file named by LUX_PROFILE
+
+  def __init__(self, player, path=None):
+    self.player = player
+    self.path = os.environ.get("LUX_PROFILE") if path is None else path
+    self.fd = None
+    self.times = dict() # subsystem -> seconds spent this turn
+    self.section = None
+    self.tstart = 0
+    self.last = None # record of the last finished turn
+
+  def timing(self, section):
+    # with profiler.timing("env"): ...
+    self.section = section
+    return self
+
+  def __enter__(self):
+    self.tstart = time.perf_counter()
+    return self
+
+  def __exit__(self, *exc):
+    self.times[self.section] = self.times.get(self.section, 0) + time.perf_counter() - self.tstart
+    return False
+
+  def end_turn(self, step, total, counters, units, budget, overrun=None):
+    # counters: name -> turn total, units: uid -> { name -> count }, overrun: where the hard deadline hit
+    record = dict(player=self.player, step=step, total=total, budget=budget, overrun=overrun, times=self.times, search=counters, units=units)
+    if self.path is not None:
+      if self.fd is None:
+        self.fd = open(self.path, "at")
+      self.fd.write(json.dumps(record) + "\n")
+      self.fd.flush()
+    self.times = dict()
+    self.last = record
+    return record
@@ -0,0 +1,36 @@
+import os, gzip, json, time, atexit
+
+class Recorder:
+  # agent_fn inputs and returned actions as gzip compressed JSON lines, one file per player and game
+  # first line is the header { player, env_cfg }, then { step, obs, remainingOverageTime, actions } per turn
+
+  def __init__(self, directory, player, env_cfg):
+    os.makedirs(directory, exist_ok=True)
+    self.path = os.path.join(directory, f"{player}_{time.strftime('%Y%m%d_%H%M%S')}.jsonl.gz")
+    self.fd = gzip.open(self.path, "wt")
+    atexit.register(self.close)
+    self._write(dict(player=player, env_cfg=env_cfg))
+
+  def _write(self, record):
+    self.fd.write(json.dumps(record, separators=(",", ":")) + "\n")
+    self.fd.flush() # runner may kill the process without closing
+
+  def record(self, step, obs, remaining, actions):
+    self._write(dict(step=step, obs=obs, remainingOverageTime=remaining, actions=actions))
+
+  def close(self):
+    if not self.fd.closed:
+      self.fd.close()
+
+def load_recording(path):
+  # -> player, env_cfg, [ record ], a recording cut off by a killed process ends at its last complete line
+  records = []
+  with gzip.open(path, "rt") as fd:
+    try:
+      for line in fd:
+        if line.endswith("\n"):
+          records.append(json.loads(line))
+    except EOFError:
+      pass
+  header = records.pop(0)
+  return header["player"], header["env_cfg"], records
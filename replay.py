@@ -0,0 +1,64 @@
+import os, sys, time, argparse
+import numpy as np
+from agent import Agent
+from observation import ObservationView
+from recorder import load_recording
+from episode_store import Episode
+from utils import set_log_level, OFF
+
+# replays recordings written with LUX_RECORD or episode store directories into a fresh Agent,
+# reports latency percentiles and checks actions are identical
+# usage: python replay.py [--log] [--no-budget] recording.jsonl.gz|episode_dir ...
+
+def load_turns(path):
+  # -> player, env_cfg, number of turns, (step, obs, remainingOverageTime, actions) per turn
+  # observations go through one reused ObservationView like in main.agent_fn, valid until the next turn
+  view = ObservationView()
+  if os.path.isdir(path):
+    episode = Episode(path)
+    turns = ((step, view.reset(obs), remaining, actions) for step, obs, remaining, actions in episode.turns())
+    return episode.player, episode.env_cfg, len(episode), turns
+  player, env_cfg, records = load_recording(path)
+  turns = ((r["step"], view.reset(r["obs"]), r["remainingOverageTime"], np.array(r["actions"])) for r in records)
+  return player, env_cfg, len(records), turns
+
+def replay(path, budget_enabled=None):
+  player, env_cfg, nsteps, turns = load_turns(path)
+  agent = Agent(player, env_cfg, budget_enabled)
+  times = dict() # section -> [ seconds ]
+  mismatches = []
+  for step, obs, remaining, recorded in turns:
+    tstart = time.perf_counter()
+    actions = agent.act(step, obs, remaining)
+    times.setdefault("act", []).append(time.perf_counter() - tstart)
+    for section, t in agent.profiler.last["times"].items():
+      times.setdefault(section, []).append(t)
+    if not np.array_equal(actions, recorded):
+      mismatches.append(step)
+  return player, nsteps, times, mismatches
+
+def report(path, player, nsteps, times, mismatches):
+  print(f"{path}: {player} {nsteps} steps")
+  print(f"  {'ms':10} {'p50':>8} {'p95':>8} {'max':>8}")
+  for section, ts in times.items():
+    ts = np.array(ts) * 1000
+    print(f"  {section:10} {np.percentile(ts, 50):8.2f} {np.percentile(ts, 95):8.2f} {ts.max():8.2f}")
+  if len(mismatches) == 0:
+    print("  actions identical")
+  else:
+    print(f"  actions differ on {len(mismatches)} steps, first at step {mismatches[0]}")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument("recordings", nargs="+")
+  parser.add_argument("--log", action="store_true", help="keep agent debug output")
+  parser.add_argument("--no-budget", action="store_true", help="plan without the turn time budget, for exact action checks")
+  args = parser.parse_args()
+  if not args.log:
+    set_log_level(OFF)
+  ok = True
+  for path in args.recordings:
+    player, nsteps, times, mismatches = replay(path, False if args.no_budget else None)
+    report(path, player, nsteps, times, mismatches)
+    ok &= len(mismatches) == 0
+  sys.exit(0 if ok else 1)
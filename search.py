@@ -0,0 +1,52 @@
+import heapq
+
+class PathQueue:
+  # heapq of [ path cost, insertion cnt, pos, energy cost, steps, delays ] entries, decrease updates the first queued
+  # entry of a (pos, delays) group in heap array order in place, so pops follow the plain list heap of the scan version
+
+  def __init__(self):
+    self.heap = []
+    self.groups = dict() # (pos, delays) -> queued entries
+    self.counter = 0
+    self.nreordered = 0 # successful decrease calls
+
+  def __len__(self):
+    return len(self.heap)
+
+  def push(self, pcost, pos, cost, steps, delays):
+    entry = [ pcost, self.counter, pos, cost, steps, delays ]
+    self.counter += 1
+    heapq.heappush(self.heap, entry)
+    group = self.groups.get((pos, delays))
+    if group is None:
+      self.groups[pos, delays] = [ entry ]
+    else:
+      group.append(entry)
+
+  def pop(self):
+    entry = heapq.heappop(self.heap)
+    group = self.groups[entry[2], entry[5]]
+    for i, e in enumerate(group):
+      if e is entry:
+        del group[i]
+        break
+    return entry
+
+  def decrease(self, pos, delays, steps, pcost, cost, nsteps):
+    # first entry of pos and delays queued at steps or later takes the new cost and steps if pcost is lower
+    group = self.groups.get((pos, delays))
+    if not group:
+      return False
+    matches = [ e for e in group if e[4] >= steps ]
+    if len(matches) == 0:
+      return False
+    entry = matches[0]
+    if len(matches) > 1:
+      ids = set(map(id, matches))
+      entry = next(e for e in self.heap if id(e) in ids)
+    if pcost >= entry[0]:
+      return False
+    entry[0], entry[3], entry[4] = pcost, cost, nsteps
+    heapq.heapify(self.heap) # same layout as sifting the lowered entry up
+    self.nreordered += 1
+    return True
@@ -0,0 +1,277 @@
+import sys, time
+import numpy as np
+from utils import box_sum, mirror_grid
+
+# headless Lux S3 game, vectorized over units, observations in the layout Agent.act consumes
+# step order and drift, spawn, relic and match end timing follow the reference luxai_s3 engine
+# usage: python simulator.py [seed] [nsteps] [--agents] benchmarks random actions or self-play of two agents
+
+EMPTY, NEBULA, ASTEROID = 0, 1, 2
+W, H = 24, 24
+DIRS = np.array([ (0, 0), (0, -1), (1, 0), (0, 1), (-1, 0), (0, 0) ]) # action -> move delta
+teams = np.arange(2)[:, None] # team index broadcast over units
+
+class Simulator:
+  max_units = 16
+  spawn_rate = 3
+  init_unit_energy = 100
+  max_unit_energy = 400
+  max_steps_in_match = 100
+  match_count = 5
+  max_energy_per_tile = 20
+  relic_config_size = 5
+
+  def __init__(self, seed=0, **params):
+    # params override the randomly drawn game parameters, e.g. unit_move_cost=2
+    self.rng = np.random.default_rng(seed)
+    rng = self.rng
+    p = dict(unit_move_cost=int(rng.integers(1, 6)), unit_sap_cost=int(rng.integers(30, 51)), unit_sap_range=int(rng.integers(3, 8)),
+             unit_sensor_range=int(rng.choice([ 1, 2, 3, 4 ])), nebula_tile_vision_reduction=int(rng.integers(0, 4)),
+             nebula_tile_energy_reduction=int(rng.choice([ 0, 1, 2, 3, 5, 25 ])),
+             nebula_tile_drift_speed=float(rng.choice([ -0.15, -0.1, -0.05, -0.025, 0.025, 0.05, 0.1, 0.15 ])),
+             energy_node_drift_speed=float(rng.choice([ 0.01, 0.02, 0.03, 0.04, 0.05 ])),
+             unit_sap_dropoff_factor=float(rng.choice([ 0.25, 0.5, 1 ])), unit_energy_void_factor=float(rng.choice([ 0.0625, 0.125, 0.25, 0.375 ])))
+    p.update(params)
+    self.params = p
+    self.nsteps = (self.max_steps_in_match + 1) * self.match_count
+    self.tile_drifts = self._drift_counts(p["nebula_tile_drift_speed"])
+    self.node_drifts = self._drift_counts(p["energy_node_drift_speed"])
+    # sensor power of a unit at (x, y) on every tile: sensor range + 1 - distance
+    xs, ys = np.meshgrid(np.arange(W), np.arange(H), indexing="ij")
+    dist = np.maximum(abs(xs[:, :, None, None] - xs), abs(ys[:, :, None, None] - ys))
+    self.sensor_kernels = np.maximum(p["unit_sensor_range"] + 1 - dist, 0).astype(np.int16)
+    self._generate_map()
+    self.reset()
+
+  @property
+  def cfg(self):
+    # env_cfg as passed to Agent
+    return dict(max_units=self.max_units, match_count_per_episode=self.match_count, max_steps_in_match=self.max_steps_in_match,
+                map_height=H, map_width=W, num_teams=2, unit_move_cost=self.params["unit_move_cost"], unit_sap_cost=self.params["unit_sap_cost"],
+                unit_sap_range=self.params["unit_sap_range"], unit_sensor_range=self.params["unit_sensor_range"])
+
+  def _drift_counts(self, speed):
+    # drifts applied before each step, the engine drifts at the end of step s when (s-1)*|v| % 1 > s*|v| % 1
+    s = np.arange(self.nsteps)
+    drifts = ((s - 1) * abs(speed)) % 1 > (s * abs(speed)) % 1
+    return np.concatenate([ [ 0 ], drifts.cumsum() ])
+
+  def _generate_map(self):
+    rng = self.rng
+    # nebula and asteroids symmetric to the anti-diagonal, spawn corners empty
+    tiles = np.zeros((W, H), dtype=np.int8)
+    tiles[rng.random((W, H)) < 0.08] = NEBULA
+    tiles[rng.random((W, H)) < 0.06] = ASTEROID
+    upper = np.add.outer(np.arange(W), np.arange(H)) < W - 1
+    tiles = np.where(upper, tiles, mirror_grid(tiles))
+    tiles[:2, :2] = EMPTY
+    tiles[-2:, -2:] = EMPTY
+    self.base_tiles = tiles
+    self._set_tiles(0)
+    # energy nodes random walk, one position set per energy drift
+    ndrifts = self.node_drifts[-1]
+    start = rng.integers(2, W - 2, (3, 2))
+    moves = np.concatenate([ np.zeros((1, 3, 2), dtype=np.int64), rng.integers(-1, 2, (ndrifts, 3, 2)) ])
+    self.node_positions = (start + moves.cumsum(0)) % W # drift -> node -> (x, y)
+    self.node_amplitudes = rng.integers(3, 8, 3)
+    self._fields = dict() # energy drift -> field
+    # relic pair per match for the first three matches, fragments from a 5x5 config around each
+    # pair m appears in the first half of match m, slot m and its mirror in slot m + 3
+    self.relic_positions = rng.integers(3, W - 3, (3, 2))
+    configs = rng.random((3, self.relic_config_size, self.relic_config_size)) < 0.25
+    self.fragment_masks = np.zeros((3, W, H), dtype=bool) # match -> fragments added with its relics
+    self._nrelics = None
+    d = self.relic_config_size // 2
+    for m, (rx, ry) in enumerate(self.relic_positions):
+      mask = np.zeros((W + 2 * d, H + 2 * d), dtype=bool)
+      mask[rx:rx + 2 * d + 1, ry:ry + 2 * d + 1] = configs[m]
+      mask = mask[d:-d, d:-d]
+      self.fragment_masks[m] = mask | mirror_grid(mask)
+    self.relic_schedule = rng.integers(0, self.max_steps_in_match // 2, 3) + np.arange(3) * (self.max_steps_in_match + 1)
+
+  def reset(self):
+    self.step = 0
+    self.match_steps = 0
+    self.wins = np.zeros(2, dtype=np.int64)
+    self.points = np.zeros(2, dtype=np.int64)
+    self.pos = np.zeros((2, self.max_units, 2), dtype=np.int64)
+    self.energy = np.zeros((2, self.max_units), dtype=np.int64)
+    self.alive = np.zeros((2, self.max_units), dtype=bool)
+    self.sensor = np.zeros((2, W, H), dtype=bool) # computed in apply, before that step's drift
+    self.map_energy = self.energy_field() # field of the last step, observed with the sensor mask
+    self.nrelics = 0 # relic pairs spawned at the last step
+
+  @property
+  def done(self):
+    # the last match is scored in the step from nsteps - 1
+    return self.step >= self.nsteps
+
+  def tiles(self):
+    n = int(self.tile_drifts[self.step]) * int(np.sign(self.params["nebula_tile_drift_speed"]))
+    if n != self._tiles_drift:
+      self._set_tiles(n)
+    return self._tiles
+
+  def _set_tiles(self, n):
+    self._tiles_drift, self._tiles = n, np.roll(self.base_tiles, (n, -n), axis=(0, 1))
+    self._nebula = self._tiles == NEBULA
+    self._asteroid = self._tiles == ASTEROID
+
+  def energy_field(self):
+    k = int(self.node_drifts[self.step])
+    if k not in self._fields:
+      xs, ys = np.meshgrid(np.arange(W), np.arange(H), indexing="ij")
+      field = np.zeros((W, H))
+      for (nx, ny), a in zip(self.node_positions[k], self.node_amplitudes):
+        for px, py in [ (nx, ny), (H - 1 - ny, W - 1 - nx) ]:
+          field += a * np.cos(np.maximum(abs(xs - px), abs(ys - py)) / 2.0)
+      self._fields[k] = np.clip(np.round(field), -self.max_energy_per_tile, self.max_energy_per_tile).astype(np.int64)
+    return self._fields[k]
+
+  def _relics(self):
+    # relic node slots and fragments of the spawned relic pairs
+    if self._nrelics != self.nrelics:
+      self._nrelics = self.nrelics
+      self._relic_nodes = np.full((6, 2), -1, dtype=np.int64)
+      for m in range(self.nrelics):
+        rx, ry = self.relic_positions[m]
+        self._relic_nodes[m], self._relic_nodes[m + 3] = (rx, ry), (H - 1 - ry, W - 1 - rx)
+      self._fragments = self.fragment_masks[:self.nrelics].any(0)
+    return self._relic_nodes, self._fragments
+
+  def relic_nodes(self):
+    return self._relics()[0]
+
+  def fragments(self):
+    return self._relics()[1]
+
+  def _grids(self, values=None, mask=None):
+    # per team and tile sum of values (unit count without values) over alive units
+    live = self.alive if mask is None else self.alive & mask
+    tiles = ((teams * W + self.pos[..., 0]) * H + self.pos[..., 1])[live]
+    return np.bincount(tiles, None if values is None else values[live], minlength=2 * W * H).reshape(2, W, H)
+
+  def vision(self, team):
+    live = self.alive[team]
+    xs, ys = self.pos[team, live, 0], self.pos[team, live, 1]
+    power = self.sensor_kernels[xs, ys].sum(0) - self.params["nebula_tile_vision_reduction"] * self._nebula
+    visible = power > 0
+    visible[xs, ys] = True # units always see their own tile
+    return visible
+
+  def observe(self, team):
+    vis = self.sensor[team]
+    seen = self.alive & vis[self.pos[..., 0], self.pos[..., 1]]
+    seen[team] = self.alive[team]
+    relics = self.relic_nodes()
+    relics_seen = (relics[:, 0] >= 0) & vis[relics[:, 0], relics[:, 1]]
+    return dict(units=dict(position=np.where(seen[..., None], self.pos, -1), energy=np.where(seen, self.energy, -1)), units_mask=seen,
+                sensor_mask=vis.copy(), map_features=dict(energy=np.where(vis, self.map_energy, -1), tile_type=np.where(vis, self.tiles(), -1)),
+                relic_nodes=np.where(relics_seen[:, None], relics, -1), relic_nodes_mask=relics_seen, team_points=self.points.copy(),
+                team_wins=self.wins.copy(), steps=self.step, match_steps=self.match_steps)
+
+  def apply(self, actions):
+    # actions: (2, max_units, 3)
+    p = self.params
+    actions = np.asarray(actions)
+    self.tiles()
+    field = self.energy_field()
+    self.map_energy = field
+    if self.match_steps == 0: # previous match ended
+      self.alive[:] = False
+    self.alive &= self.energy >= 0
+    self.nrelics = int((self.step >= self.relic_schedule).sum())
+    # moves, off map moves pay energy without moving, the engine checks the wrapped or clamped tile for asteroids
+    a = actions[..., 0]
+    moving = self.alive & (a >= 1) & (a <= 4) & (self.energy >= p["unit_move_cost"])
+    target = self.pos + DIRS[a]
+    checked = np.where((target < 0) | (target >= W), W - 1, target)
+    moves = moving & ~self._asteroid[checked[..., 0], checked[..., 1]]
+    self.pos = np.where(moves[..., None], np.clip(target, 0, W - 1), self.pos)
+    self.energy -= moves * p["unit_move_cost"]
+    energy = self.energy.copy() # after moves, saps are paid from it and collisions and void use it
+    # saps, damage to opponent units on target tile and its 8 neighbours
+    dsap = actions[..., 1:]
+    sx, sy = self.pos[..., 0] + dsap[..., 0], self.pos[..., 1] + dsap[..., 1]
+    saps = self.alive & (a == 5) & (energy >= p["unit_sap_cost"]) & (np.abs(dsap).max(-1) <= p["unit_sap_range"])
+    saps &= (sx >= 0) & (sx < W) & (sy >= 0) & (sy < H)
+    xs, ys = self.pos[..., 0], self.pos[..., 1]
+    if saps.any():
+      damage = np.zeros((2, W, H), dtype=np.int64)
+      for t in [ 0, 1 ]:
+        hits = np.bincount(sx[t, saps[t]] * H + sy[t, saps[t]], minlength=W * H).reshape(W, H)
+        damage[1 - t] = p["unit_sap_cost"] * hits + (p["unit_sap_cost"] * p["unit_sap_dropoff_factor"] * (box_sum(hits, 1) - hits)).astype(np.int64)
+      self.energy -= damage[teams, xs, ys] * self.alive
+    self.energy -= saps * p["unit_sap_cost"]
+    # collisions, the team with less total energy on a shared tile loses its units there, both on a tie
+    totals, counts = self._grids(energy), self._grids()
+    self.alive &= (counts[1 - teams, xs, ys] == 0) | (totals[1 - teams, xs, ys] < totals[teams, xs, ys])
+    # energy void, opponent units on adjacent tiles drain a share of energy split among units on the tile before collisions
+    e = np.zeros((2, W + 2, H + 2))
+    e[:, 1:-1, 1:-1] = totals
+    void = (e[:, :-2, 1:-1] + e[:, 2:, 1:-1] + e[:, 1:-1, :-2] + e[:, 1:-1, 2:])[::-1] # drained from the opponent
+    share = np.floor(p["unit_energy_void_factor"] * void[teams, xs, ys] / np.maximum(counts[teams, xs, ys], 1))
+    self.energy -= (share * self.alive).astype(np.int64)
+    # energy field, negative units only recover when the gain brings them to 0 or above
+    gain = field[xs, ys] - p["nebula_tile_energy_reduction"] * self._nebula[xs, ys]
+    energy = np.clip(self.energy + gain, 0, self.max_unit_energy)
+    energy = np.where((self.energy < 0) & (self.energy + gain < 0), self.energy, energy)
+    self.energy = np.where(self.alive, energy, self.energy)
+    # spawn lowest free unit id at the team corner
+    if self.match_steps % self.spawn_rate == 0:
+      for t, corner in [ (0, (0, 0)), (1, (W - 1, H - 1)) ]:
+        free = np.flatnonzero(~self.alive[t])
+        if len(free) > 0:
+          self.alive[t, free[0]] = True
+          self.pos[t, free[0]] = corner
+          self.energy[t, free[0]] = self.init_unit_energy
+    self.sensor = np.stack([ self.vision(t) for t in [ 0, 1 ] ])
+    # points for each fragment tile occupied by a live unit
+    self.points += ((self._grids(mask=self.energy >= 0) > 0) & self.fragments()).sum((1, 2))
+    if self.match_steps >= self.max_steps_in_match:
+      self._end_match()
+    self.step += 1
+    self.match_steps += 1
+
+  def _end_match(self):
+    # more points wins, then more unit energy, then a coin flip, units are removed at the next step
+    if self.points[0] != self.points[1]:
+      winner = int(np.argmax(self.points))
+    else:
+      energy = (self.energy * self.alive).sum(1)
+      winner = int(np.argmax(energy)) if energy[0] != energy[1] else int(self.rng.integers(2))
+    self.wins[winner] += 1
+    self.points[:] = 0
+    self.match_steps = -1
+
+def benchmark(seed, nsteps):
+  sim = Simulator(seed)
+  rng = np.random.default_rng(seed)
+  actions = np.zeros((nsteps, 2, sim.max_units, 3), dtype=np.int64)
+  actions[..., 0] = rng.integers(0, 5, (nsteps, 2, sim.max_units))
+  tstart = time.perf_counter()
+  for i in range(nsteps):
+    if sim.done:
+      sim.reset()
+    sim.apply(actions[i])
+    sim.observe(0), sim.observe(1)
+  return nsteps / (time.perf_counter() - tstart)
+
+def self_play(seed, nsteps=None):
+  # agents get the observed step like the runner, a full game unless nsteps is given
+  from agent import Agent
+  sim = Simulator(seed)
+  agents = [ Agent(f"player_{t}", sim.cfg) for t in [ 0, 1 ] ]
+  while not sim.done and (nsteps is None or sim.step < nsteps):
+    actions = np.stack([ agents[t].act(sim.step, sim.observe(t), 60) for t in [ 0, 1 ] ])
+    sim.apply(actions)
+  return sim
+
+if __name__ == "__main__":
+  seed = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+  nsteps = int(sys.argv[2]) if len(sys.argv) > 2 else 505
+  if "--agents" in sys.argv:
+    sim = self_play(seed, nsteps)
+    print(f"step {sim.step} points {sim.points.tolist()} wins {sim.wins.tolist()}")
+  else:
+    print(f"{benchmark(seed, nsteps):.0f} steps/s")
@@ -1,6 +1,8 @@
 import numpy as np
 from task_manager import Task
-from utils import debug, spawn_points, manhattan, center, pos_to_plus, clip, euclid, pos_to_5x5, mirror, pos_to_belt, pos_to_7x7, pos_to_9x9
+from utils import Logger, spawn_points, manhattan, center, clip, euclid, pos_to_5x5, mirror, pos_to_belt, pos_to_7x7, pos_to_9x9, box_sum
+
+log = Logger("strategy")
 
 class Strategy:
 
@@ -15,7 +17,7 @@ class Strategy:
     self.oppreward = obs["team_points"][self.agent.opp_team_id] - self.team_points[self.agent.opp_team_id]
     self.team_points = int(obs["team_points"][0]), int(obs["team_points"][1])
     self.team_wins = int(obs["team_wins"][0]), int(obs["team_wins"][1])
-    debug(f"rew={self.reward} pts={self.team_points} win={self.team_wins}\n")
+    log.info("rew={} pts={} win={}\n", self.reward, self.team_points, self.team_wins)
     # fragments confirmation
     self.abandon_fragments = False
     if self.reward > 0:
@@ -47,29 +49,47 @@ class Strategy:
       self.phase_tasks.add(Task.COLLECT)
       self.phase_tasks.add(Task.BACKUP)
 
-    self.high_ground = dict() # pos -> value
-    fnotcovered = set()
+    # high ground: energy tiles with opp fragments not covered by my units in sap range
+    fnotcovered = np.zeros((24, 24), dtype=np.int32)
     for f in self.oppfrags:
-      if not any(self.agent.unitman.my_unit(uid).pos == f for uid in self.agent.unitman.live_units()):
-        fnotcovered.add(f)
-    self.high_ground = dict() # pos -> value
-    for x in range(24):
-      for y in range(24):
-        if self.agent.env.tot_tile_energy((x,y), 0) >= self.min_hg_energy:
-          fisr = len([ f for f in fnotcovered if self.agent.env.in_sap_range((x,y), f) ])
-          if fisr > 0:
-            fisr = min(5, fisr)
-            self.high_ground[x,y] = fisr
+      fnotcovered[f] = 1
+    for uid in self.agent.unitman.live_units():
+      fnotcovered[self.agent.unitman.my_unit(uid).pos] = 0
+    fisr = np.minimum(5, box_sum(fnotcovered, self.agent.env.unit_sap_range))
+    self.high_ground = np.where(self.agent.env.tot_energy_grid(0) >= self.min_hg_energy, fisr, 0) # pos -> value
+    self._compile_priorities()
+
+  def _compile_priorities(self):
+    # position and step dependent priority terms for this turn, crowding and unit terms are added in priorities()
+    self.opp_count = self.agent.unitman.live_count[self.agent.opp_team_id] # live visible opp units on tile
+    self.opp_energy = self.agent.unitman.live_energy[self.agent.opp_team_id]
+    myfrags = np.zeros((24, 24), dtype=np.int64)
+    for f in self.myfrags:
+      myfrags[f] = 1
+    self.tile_energy = self.agent.env.energy_cube.astype(np.int64) # dstep, pos -> total tile energy
+    self.fragment_energy = np.where(self.agent.env.confirmed_mask() & (self.tile_energy > 0), 5 * self.tile_energy, 0)
+    xs, ys = np.meshgrid(np.arange(24), np.arange(24), indexing="ij")
+    self.base_priority = { # task type -> pos -> priority
+      Task.LEAVE: np.full((24, 24), 2000, dtype=np.int64),
+      Task.EXPLORE: np.full((24, 24), 500, dtype=np.int64),
+      Task.RECHARGE: 500 - 20 + 3 * (50 - self.agent.env.match_step()) + 20 * self.high_ground.astype(np.int64),
+      Task.COLLECT: 500 + 100 * myfrags,
+      Task.BACKUP: 500 + 100 * myfrags,
+      Task.IMPROVE: -5 * (1 + abs(xs - center[0])) * (1 + abs(ys - center[1])),
+    }
 
   def fstatus(self):
     s = "High ground:\n"
     for y in range(24):
       for x in range(24):
-        hg = self.high_ground[x,y] if (x,y) in self.high_ground else 0
-        s += str(hg).zfill(2) + " "
+        s += str(self.high_ground[x,y]).zfill(2) + " "
       s += "\n"
     return s
 
+  def decisive(self):
+    # last steps of a match where points still can change the result
+    return self.agent.env.match_step() > self.agent.env.max_steps_in_match - 20
+
   def max_explorers(self):
     return 10 - self.agent.env.unit_sensor_range
 
@@ -82,9 +102,9 @@ class Strategy:
     return len(self.agent.env.relic_steps) < 3 and len(self.agent.env.relic_steps) <= self.agent.env.match()
 
   def needs_exploring(self, p):
-    if p not in self.agent.env.discovered:
+    if not self.agent.env.is_discovered(p):
       return True
-    discstep = self.agent.env.discovered[p].step
+    discstep = self.agent.env.last_seen(p)
     if self.agent.env.match_step(discstep) > 50 or self.agent.env.match(discstep) > 2:
       return False
     if self.agent.env.step - discstep > (5+self.agent.env.unit_sensor_range):
@@ -99,70 +119,32 @@ class Strategy:
   def path_cost(self, cost, steps):
     return cost + 10*steps
 
-  def priority(self, unit, task):
-    steps_factor = 10 #10 
-    crowd_factor = 30 #30
-    if task.type == Task.LEAVE:
-      prior = 2000
-      prior -= task.cost
-      prior -= steps_factor * task.steps
-    elif task.type == Task.SAP:
-      prior = 500 
-      sappot = task.cost # actually sap value
-      prior += sappot + (unit.energy // 5)
-    elif task.type == Task.EXPLORE:
-      prior = 500
-      prior -= task.cost
-      prior -= steps_factor * task.steps
-      # small or no effect
-      #age = self.agent.env.step - self.agent.env.last_seen(task.pos) # tile last seen
-      #age = min(20, age)
-      #prior += 2*age
-    elif task.type == Task.RECHARGE:
-      prior = 500 - 20
-      prior -= task.cost
-      prior -= steps_factor * task.steps
-      prior -= crowd_factor * self.agent.taskman.crowding(task.pos, task.steps)
-      prior += 3 * (50 - self.agent.env.match_step())
-      fisr = self.high_ground[task.pos]
-      prior += 20 * fisr # number of fragments in sap range
-      if not self.agent.env.is_confirmed_fragment(unit.pos) and task.steps <= 7 and self.agent.env.in_sap_range(task.pos, unit.pos):
-        ounits = [ u for u in self.agent.unitman.opp_visible_units() if u.pos == task.pos and u.energy >= 0 ]
-        if len(ounits) > 0 and sum(u.energy for u in ounits) < unit.energy - task.cost - 20: 
-          prior += 150 # ram opp units
-      prior += (200 - unit.energy)
-    elif task.type == Task.COLLECT or task.type == Task.BACKUP:
-      prior = 500
-      prior -= task.cost
-      prior -= steps_factor * task.steps
-      prior -= crowd_factor * self.agent.taskman.crowding(task.pos, task.steps)
-      prior += 100 if task.pos in self.myfrags else 0
-      if task.steps <= 7 and self.agent.env.in_sap_range(task.pos, unit.pos):
-        ounits = [ u for u in self.agent.unitman.opp_visible_units() if u.pos == task.pos and u.energy >= 0 ]
-        if len(ounits) > 0 and sum(u.energy for u in ounits) < unit.energy - task.cost - 20: 
-          prior += 150# ram opp units
-      uenergy = (10 - unit.energy // 40) if unit.pos == task.pos else 0 # keep unit with lowest energy on fragment
-      prior += uenergy
-      if self.agent.env.is_confirmed_fragment(task.pos) and self.agent.env.tot_tile_energy(task.pos, task.steps) > 0:
-        tenergy = self.agent.env.tot_tile_energy(task.pos, task.steps) # tile energy
-        prior += 5 * tenergy
-      if task.type == Task.BACKUP and task.steps == 1: # assure backup gets picked before collect
-        prior += crowd_factor * self.agent.taskman.crowding(task.pos, task.steps)
-        prior += task.cost + steps_factor * task.steps + 11
-    elif task.type == Task.IMPROVE:
-      prior = 0
-      prior -= task.cost
-      prior -= steps_factor * task.steps
-      prior -= crowd_factor * self.agent.taskman.crowding(task.pos, task.steps)
-      ediff = self.agent.env.tot_tile_energy(task.pos, task.steps) - self.agent.env.tot_tile_energy(unit.pos, 0)
-      nsteps = 10 - min(10, task.steps)
-      prior += nsteps * ediff
-      pos = (1 + abs(task.pos[0] - center[0])) * (1 + abs(task.pos[1] - center[1]))
-      prior -= 5 * pos
-
-    if (task.type == Task.SAP or unit.pos == task.pos) and not self.agent.tactics.is_safe(unit.pos, unit.energy):
-      prior -= 1000 # about to get rammed
-
-    #if self.agent.taskman.task_kept(unit, task):
-    #  prior += 5 # slightly prefer continuing old task
-    return int(prior)
+  def priorities(self, unit, ttype, xs, ys, costs, steps):
+    # priorities of tasks of one type at positions xs, ys reached with costs in steps
+    steps_factor = 10
+    crowd_factor = 30
+    if ttype == Task.SAP: # xs, ys are relative sap positions
+      prior = 500 + costs + (unit.energy // 5)
+    else:
+      prior = self.base_priority[ttype][xs, ys] - costs - steps_factor * steps
+    if ttype in (Task.RECHARGE, Task.COLLECT, Task.BACKUP, Task.IMPROVE):
+      crowding = self.agent.taskman.tracker.crowding_at(xs, ys, steps)
+      prior = prior - crowd_factor * crowding
+    if ttype in (Task.RECHARGE, Task.COLLECT, Task.BACKUP) and (ttype != Task.RECHARGE or not self.agent.env.is_confirmed_fragment(unit.pos)):
+      ram = (steps <= 7) & (abs(xs - unit.pos[0]) <= self.agent.env.unit_sap_range) & (abs(ys - unit.pos[1]) <= self.agent.env.unit_sap_range)
+      ram &= (self.opp_count[xs, ys] > 0) & (self.opp_energy[xs, ys] < unit.energy - costs - 20)
+      prior = prior + 150 * ram # ram opp units
+    at_unit = (xs == unit.pos[0]) & (ys == unit.pos[1])
+    if ttype == Task.RECHARGE:
+      prior = prior + (200 - unit.energy)
+    elif ttype == Task.COLLECT or ttype == Task.BACKUP:
+      prior = prior + np.where(at_unit, 10 - unit.energy // 40, 0) # keep unit with lowest energy on fragment
+      prior = prior + self.fragment_energy[steps, xs, ys]
+      if ttype == Task.BACKUP: # assure backup gets picked before collect
+        prior = prior + np.where(steps == 1, crowd_factor * crowding + costs + steps_factor * steps + 11, 0)
+    elif ttype == Task.IMPROVE:
+      ediff = self.tile_energy[steps, xs, ys] - self.agent.env.tot_tile_energy(unit.pos, 0)
+      prior = prior + (10 - np.minimum(10, steps)) * ediff
+    if not self.agent.tactics.is_safe(unit.pos, unit.energy):
+      prior = prior - 1000 * (at_unit | (ttype == Task.SAP)) # about to get rammed
+    return prior.astype(np.int64) # truncates like int()
@@ -1,6 +1,8 @@
 import numpy as np
 from unit_manager import Unit
-from utils import debug, dir2delta, path2str, pos_to_3x3, manhattan, spawn_points, pos_to_plus
+from utils import Logger, dir2delta, path2str, manhattan, spawn_points, box_sum
+
+log = Logger("tactics")
 
 class OpponentModel:
 
@@ -11,7 +13,7 @@ class OpponentModel:
   
   def match_reset(self):
     self.opp_tracking = { uid: Unit(None, uid, spawn_points[self.oid], 100) for uid in range(16) } # ouid -> Unit
-    self.sap_danger = { (x,y): 0 for x in range(24) for y in range(24) }
+    self.sap_danger = np.zeros((24, 24), dtype=np.int64)
     self.hidden = set()
 
   def dead(self, uid):
@@ -20,49 +22,43 @@ class OpponentModel:
   def seen(self, uid, pos, energy):
     self.opp_tracking[uid].update_position(pos)
     self.opp_tracking[uid].update_energy(energy)
-    self._update_danger(uid)
-    self._update_potential(uid)
-  
-  def _update_danger(self, uid):
-    ounit = self.opp_tracking[uid]
-    for p in pos_to_plus[ounit.pos]:
-      self.opp_threat[p] += ounit.energy
-    if ounit.energy >= self.agent.env.unit_sap_cost:
-      for dx in range(-1-self.agent.env.unit_sap_range, self.agent.env.unit_sap_range+2): # sap_range + 1 for side saps
-        for dy in range(-1-self.agent.env.unit_sap_range, self.agent.env.unit_sap_range+2):
-            p = ounit.pos[0] + dx, ounit.pos[1] + dy
-            if self.agent.env.on_map(p):
-              self.sap_danger[p] += 1
-              self.sap_danger[p] = min(10, self.sap_danger[p])
-
-  def _update_potential(self, uid):
-    ounit = self.opp_tracking[uid]
-    for sp in pos_to_3x3[ounit.pos]:
-      if sp == ounit.pos:
-        self.sap_potential[sp] += 100
-        if self.agent.env.is_confirmed_fragment(sp):
-          self.sap_potential[sp] += 50
-      else:
-        self.sap_potential[sp] += int(90*self.agent.env.unit_sap_dropoff_factor) # prefer direct
+
+  def _update_danger(self, units):
+    # threat of ramming on plus around units, sap danger in sap range + 1 (side saps) of units able to sap
+    energy = np.zeros((26, 26), dtype=np.int64) # padded by one tile
+    sappers = np.zeros((24, 24), dtype=np.int64)
+    for ounit in units:
+      energy[ounit.pos[0]+1, ounit.pos[1]+1] += ounit.energy
+      if ounit.energy >= self.agent.env.unit_sap_cost:
+        sappers[ounit.pos] += 1
+    self.opp_threat = energy[1:25, 1:25] + energy[:24, 1:25] + energy[2:, 1:25] + energy[1:25, :24] + energy[1:25, 2:]
+    self.sap_danger = np.minimum(10, self.sap_danger + box_sum(sappers, self.agent.env.unit_sap_range + 1))
+
+  def _update_potential(self, units):
+    # visible units: direct sap on unit, side saps on 3x3 around it
+    count = np.zeros((24, 24), dtype=np.int64)
+    for ounit in units:
+      count[ounit.pos] += 1
+    self.sap_potential = 100 * count + 50 * count * self.agent.env.confirmed_mask()
+    self.sap_potential += int(90*self.agent.env.unit_sap_dropoff_factor) * (box_sum(count, 1) - count) # prefer direct
 
   def update(self, oppreward):
-    self.sap_potential = { (x,y): 0 for x in range(24) for y in range(24) }
-    self.opp_threat = { (x,y): 0 for x in range(24) for y in range(24) }
-    for x in range(24):
-      for y in range(24):
-        self.sap_danger[x,y] -= 1 # reduce sap danger each turn
-        self.sap_danger[x,y] = max(0, self.sap_danger[x,y])
+    self.sap_danger = np.maximum(self.sap_danger - 1, 0) # reduce sap danger each turn
     # update visible units
-    opp_visible = self.agent.unitman.vis_units_history[-1][self.agent.opp_team_id]
+    opp_visible = self.agent.unitman.visible_ids(self.agent.opp_team_id)
+    seen, remembered = [], []
     for uid in range(16):
       if uid in opp_visible:
         ounit = self.agent.unitman.opp_unit(uid)
         if ounit.energy >= 0:
           self.seen(uid, ounit.pos, ounit.energy)
+          seen.append(self.opp_tracking[uid])
         else:
           self.dead(uid)
       elif self.agent.env.is_confirmed_fragment(self.opp_tracking[uid].pos) and not self.agent.env.is_visible(self.opp_tracking[uid].pos):
-        self._update_danger(uid) # from memory
+        remembered.append(self.opp_tracking[uid]) # from memory
+    self._update_danger(seen + remembered)
+    self._update_potential(seen)
     # infer invisible opps on fragments
     self.hidden = set()
     if oppreward > 0:
@@ -81,30 +77,100 @@ class OpponentModel:
           self.hidden.add(fp)
           oppreward -= 1
 
-  def __repr__(self):
-    s = "Danger map:\n"
+  def _grid_str(self, grid, width):
+    s = ""
     for y in range(24):
       for x in range(24):
-        s += str(self.sap_danger[x,y]).zfill(2) + " "
+        s += str(grid.item(x, y)).zfill(width) + " "
       s += "\n"
+    return s
+
+  def __repr__(self):
+    s = "Danger map:\n"
+    s += self._grid_str(self.sap_danger, 2)
     s += "Potential map:\n"
-    for y in range(24):
-      for x in range(24):
-        s += str(self.sap_potential[x,y]).zfill(4) + " "
-      s += "\n"
+    s += self._grid_str(self.sap_potential, 4)
     s += "Threat map:\n"
-    for y in range(24):
-      for x in range(24):
-        s += str(self.opp_threat[x,y]).zfill(4) + " "
-      s += "\n"
+    s += self._grid_str(self.opp_threat, 4)
     return s
 
+class SapEngine:
+  # value of sapping each tile this turn, updated as assigned saps and rams take opp units out
+
+  def __init__(self, agent):
+    self.agent = agent
+    self.value = np.zeros((24, 24), dtype=np.int64)
+
+  def reset(self):
+    self.energy = { unit.id: unit.energy for unit in self.agent.unitman.opp_visible_units() } # ouid -> energy left after assigned saps
+    self.weights = dict() # ouid -> (pos, direct, side) for opp units still worth sapping
+    direct = np.zeros((24, 24), dtype=np.int64)
+    side = np.zeros((24, 24), dtype=np.int64)
+    sdoff = self.agent.env.unit_sap_dropoff_factor
+    for u in self.agent.unitman.opp_visible_units():
+      if u.energy < 0: # dying
+        continue
+      if self.agent.env.is_confirmed_fragment(u.pos):
+        self.weights[u.id] = (u.pos, 100, int(90*sdoff)) # side * 0.9 so direct is preferred even with sdoff = 1
+      else:
+        self.weights[u.id] = (u.pos, 70, int(60*sdoff))
+      direct[u.pos] += self.weights[u.id][1]
+      side[u.pos] += self.weights[u.id][2]
+    # invisible units on fragments
+    if self.agent.strategy.all_confirmed:
+      for hp in self.agent.tactics.oppmodel.hidden:
+        direct[hp] += 100
+        side[hp] += int(90*sdoff)
+    # sap on tile hits units on it directly and units around it with side damage
+    self.value = direct + box_sum(side, 1) - side
+
+  def _remove(self, uid):
+    if uid not in self.weights:
+      return
+    (x, y), direct, side = self.weights.pop(uid)
+    self.value[max(0, x-1):x+2, max(0, y-1):y+2] -= side
+    self.value[x, y] -= direct - side
+
+  def ram(self, uid):
+    self._remove(uid)
+
+  def apply_sap(self, unit, dpos):
+    x, y = unit.pos[0] + dpos[0], unit.pos[1] + dpos[1]
+    for u in self.agent.unitman.visible_units_on((x,y), self.agent.opp_team_id):
+      self.energy[u.id] -= self.agent.env.unit_sap_cost
+    for u in self.agent.unitman.visible_units_on_3x3((x,y), self.agent.opp_team_id):
+      if u.pos != (x,y):
+        self.energy[u.id] -= self.agent.env.unit_sap_cost * self.agent.env.unit_sap_dropoff_factor
+    for u in self.agent.unitman.visible_units_on_3x3((x,y), self.agent.opp_team_id):
+      if self.energy[u.id] < 0:
+        self._remove(u.id)
+
+  def targets(self, unit):
+    # offsets in sap range with some sap potential
+    r = self.agent.env.unit_sap_range
+    x, y = unit.pos
+    x0, y0 = max(0, x-r), max(0, y-r)
+    window = self.agent.tactics.oppmodel.sap_potential[x0:x+r+1, y0:y+r+1]
+    return [ (wx + x0 - x, wy + y0 - y) for wx, wy in np.argwhere(window > 0).tolist() ]
+
+  def evaluate(self, unit, dpos):
+    bonus = 30 if self.agent.env.is_confirmed_fragment(unit.pos) else 0
+    return bonus + self.value.item(unit.pos[0] + dpos[0], unit.pos[1] + dpos[1])
+
+  def evaluate_all(self, unit, dposs):
+    if len(dposs) == 0:
+      return []
+    bonus = 30 if self.agent.env.is_confirmed_fragment(unit.pos) else 0
+    dx, dy = np.array(dposs).T
+    return (bonus + self.value[unit.pos[0] + dx, unit.pos[1] + dy]).tolist()
+
 class Tactics:
 
   def __init__(self, agent, env_cfg):
     self.agent = agent
     self.last_actions = None
     self.oppmodel = OpponentModel(self.agent) 
+    self.sapengine = SapEngine(self.agent)
 
   def update(self, obs):
     # sap dropoff estimation
@@ -115,17 +181,15 @@ class Tactics:
       self._infere_vision()
 
   def _infere_vision(self):
-    if len(self.agent.unitman.all_visible_units(self.agent.team_id)) == 0:
+    units = self.agent.unitman.all_visible_units(self.agent.team_id)
+    if len(units) == 0:
       return
-    maxd = 0
-    for tpos in self.agent.env.observations[-1]:
-      mindx = min(abs(u.pos[0] - tpos[0]) for u in self.agent.unitman.all_visible_units(self.agent.team_id))
-      mindy = min(abs(u.pos[1] - tpos[1]) for u in self.agent.unitman.all_visible_units(self.agent.team_id))
-      if mindx > maxd:
-        maxd = mindx
-      if mindy > maxd:
-        maxd = mindy
-    self.agent.env.set_sensor_range(maxd)
+    # distance of each map column and row to the nearest unit
+    ux, uy = np.array([ u.pos for u in units ]).T
+    mindx = np.abs(np.arange(24)[:, None] - ux[None, :]).min(axis=1)
+    mindy = np.abs(np.arange(24)[:, None] - uy[None, :]).min(axis=1)
+    maxd = np.maximum(mindx[:, None], mindy[None, :])[self.agent.env.visible].max(initial=0)
+    self.agent.env.set_sensor_range(int(maxd))
 
   def _infere_sdoff(self):
     if not self.agent.env.nebula_enred_known:
@@ -134,80 +198,38 @@ class Tactics:
       return
     # sapping units that didn't die (i.e. changed position, in case of dying and respawning right away)
     sapunits = [ u for u in self.agent.unitman.all_visible_units(self.agent.team_id) if u.pos == u.last_pos ]
-    sapunits = [ u for u in sapunits if u.id in self.agent.tactics.last_actions and self.agent.tactics.last_actions[u.id][0] == 5]
-    sapunits = { u.id:self.agent.tactics.last_actions[u.id][1:3] for u in sapunits }
+    sapunits = { u.id: self.last_actions[u.id][1:3] for u in sapunits if u.id in self.last_actions and self.last_actions[u.id][0] == 5 }
     if len(sapunits) == 0:
       return
-    # count number of saps on each position
-    sappos = { (self.agent.unitman.my_unit(uid).pos[0]+dx, self.agent.unitman.my_unit(uid).pos[1]+dy):0 for uid, (dx, dy) in sapunits.items() }
-    for uid, (dx, dy) in sapunits.items():
-      x, y = self.agent.unitman.my_unit(uid).pos
-      sappos[x+dx, y+dy] += 1
+    # count number of saps on each position and side saps hitting each position
+    targets = np.array([ self.agent.unitman.my_unit(uid).pos for uid in sapunits ]) + np.array(list(sapunits.values()))
+    nsaps = np.zeros((24, 24), dtype=np.int64)
+    np.add.at(nsaps, (targets[:, 0], targets[:, 1]), 1)
+    side_saps = box_sum(nsaps, 1) - nsaps
     # opponent units visible on both this and previous round
-    visible_opp_units = set()
-    for uid in self.agent.unitman.vis_units_history[-1][self.agent.opp_team_id]:
-      if uid in self.agent.unitman.vis_units_history[-2][self.agent.opp_team_id]:
-        visible_opp_units.add(uid)
-    debug(f"sdoff: {sapunits} {sappos} {visible_opp_units}\n")
+    ouids = sorted(self.agent.unitman.visible_ids(self.agent.opp_team_id) & self.agent.unitman.visible_ids(self.agent.opp_team_id, 1))
+    log.debug(lambda: f"sdoff: {sapunits} {targets.tolist()} {ouids}\n")
+    if len(ouids) == 0:
+      return
+    ounits = [ self.agent.unitman.opp_unit(uid) for uid in ouids ]
+    xs, ys = np.array([ u.pos for u in ounits ]).T
+    energy = np.array([ u.energy for u in ounits ])
+    moved = np.array([ u.pos != u.last_pos for u in ounits ])
     # check for energy difference for units next to sap positions
-    for ouid in visible_opp_units:
-      ounit = self.agent.unitman.opp_unit(ouid)
-      if len(self.agent.unitman.visible_units_on_plus(ounit.pos, self.agent.team_id)) > 0:
-        continue # skip units affected by void  
-      nsaps = sum(sappos[spos] for spos in sappos if ounit.pos != spos and ounit.pos in pos_to_3x3[spos])
-      if nsaps > 0:
-        dene = ounit.energy - ounit.last_energy
-        if ounit.energy >= 0: # only live unit gets energy from tile
-          dene -= self.agent.env.tot_tile_energy(ounit.pos, 0)
-        dene += self.agent.env.unit_move_cost if ounit.pos != ounit.last_pos else 0 # add movement 
-        debug(f"dene: {ounit} {dene} / {nsaps}\n")
-        self.agent.env.set_sap_dropoff(dene, nsaps)
+    dene = energy - np.array([ u.last_energy for u in ounits ])
+    dene -= np.where(energy >= 0, self.agent.env.tot_energy_grid(0)[xs, ys], 0) # only live unit gets energy from tile
+    dene += np.where(moved, self.agent.env.unit_move_cost, 0) # add movement 
+    nsides = side_saps[xs, ys]
+    valid = (nsides > 0) & (self.agent.unitman.occupancy_plus[self.agent.team_id][xs, ys] == 0) # skip units affected by void
+    for i in np.flatnonzero(valid).tolist():
+      log.debug("dene: {} {} / {}\n", ounits[i], dene[i], nsides[i])
+    self.agent.env.set_sap_dropoff(dene[valid], nsides[valid])
 
   def is_safe(self, pos, energy):
-    return energy >= self.oppmodel.opp_threat[pos]
+    return energy >= self.oppmodel.opp_threat.item(pos)
 
   def can_sap(self, unit):
     return unit.energy >= self.agent.env.unit_sap_cost
-  
-  def sap_potential(self, pos):
-    return self.oppmodel.sap_potential[pos]
 
-  def _apply_sap(self, unit, dpos, opp_units_ene):
-    x, y = unit.pos[0] + dpos[0], unit.pos[1] + dpos[1]
-    for u in self.agent.unitman.visible_units_on((x,y), self.agent.opp_team_id):
-      opp_units_ene[u.id] -= self.agent.env.unit_sap_cost
-    for u in self.agent.unitman.visible_units_on_3x3((x,y), self.agent.opp_team_id):
-      if u.pos != (x,y):
-        opp_units_ene[u.id] -= self.agent.env.unit_sap_cost * self.agent.env.unit_sap_dropoff_factor
-
-  def _evaluate_sap(self, unit, dpos, opp_units_ene, opp_units_ram):
-    spos = unit.pos[0] + dpos[0], unit.pos[1] + dpos[1]
-    sappot = 0 
-    if self.agent.env.is_confirmed_fragment(unit.pos):
-      sappot += 30
-    # damaging visible units
-    for u in self.agent.unitman.visible_units_on_3x3(spos, self.agent.opp_team_id):
-      if u.id in opp_units_ram or opp_units_ene[u.id] < 0: # skip units to be rammed or dying
-        continue
-      if self.agent.env.is_confirmed_fragment(u.pos):
-        if spos == u.pos: # direct
-          sappot += 100
-        else: # side * 0.9 so direct is preferred even with sdoff = 1
-          sappot += int(90*self.agent.env.unit_sap_dropoff_factor)
-      else:
-       if spos == u.pos: # direct
-         sappot += 70
-       else: # side * 0.9 so direct is preferred even with sdoff = 1
-         sappot += int(60*self.agent.env.unit_sap_dropoff_factor)
-    # damaging invisible units on fragemnts
-    if self.agent.strategy.all_confirmed:
-      for sp in pos_to_3x3[spos]:
-        if sp in self.oppmodel.hidden:
-          if spos == sp: # direct
-            sappot += 100
-          else: # side
-            sappot += int(90 * self.agent.env.unit_sap_dropoff_factor)
-    return sappot
-    
   def danger(self, pos, steps):
-    return self.oppmodel.sap_danger[pos] > 0
+    return self.oppmodel.sap_danger.item(pos) > 0
@@ -1,7 +1,15 @@
 import heapq
-from utils import debug, DELTAS, delta2dir, pos_to_3x3, pos_to_srange, dir2str, dir2delta, pos_to_plus, manhattan, spawn_points
+import numpy as np
+from search import PathQueue
+from utils import Logger, DELTAS, delta2dir, pos_to_srange, dir2str, dir2delta, manhattan, spawn_points
+
+log = Logger("taskman")
+
+# per unit search work counted in each turn
+search_counters = ("searches", "popped", "relaxed", "reordered", "expanded", "reused", "candidates", "invalidated", "rerouted", "kept", "dropped")
 
 class Task:
+  __slots__ = ("type", "pos", "cost", "steps", "priority")
 
   LEAVE = 'L'
   SAP = 'S'
@@ -27,12 +35,105 @@ class Task:
   def __repr__(self):
     return f"<{self.type}{self.pos} {self.cost} {self.steps} {self.priority}>"
 
+class Candidates:
+  # task candidates of one unit appended to per field lists in generation order, scored per task type once all are added,
+  # only the picked candidate becomes a Task
+
+  types = [ Task.LEAVE, Task.SAP, Task.COLLECT, Task.EXPLORE, Task.IMPROVE, Task.RECHARGE, Task.BACKUP ]
+  codes = { t: i for i, t in enumerate(types) }
+
+  def __init__(self):
+    self.tcodes = []
+    self.xs = []
+    self.ys = []
+    self.costs = []
+    self.steps = []
+    self.pcosts = []
+    self.priorities = None
+
+  def __len__(self):
+    return len(self.tcodes)
+
+  def add(self, ttype, pos, cost, steps, pcost):
+    self.tcodes.append(self.codes[ttype])
+    self.xs.append(pos[0])
+    self.ys.append(pos[1])
+    self.costs.append(cost)
+    self.steps.append(steps)
+    self.pcosts.append(pcost)
+
+  def score(self, unit, strategy):
+    tcodes, xs, ys, costs, steps = (np.array(c, dtype=np.int64) for c in (self.tcodes, self.xs, self.ys, self.costs, self.steps))
+    self.priorities = np.zeros(len(tcodes), dtype=np.int64)
+    for code in np.unique(tcodes).tolist():
+      sel = tcodes == code
+      self.priorities[sel] = strategy.priorities(unit, self.types[code], xs[sel], ys[sel], costs[sel], steps[sel])
+
+  def best(self):
+    # index of the highest priority, earlier candidate wins ties
+    return int(np.argmax(self.priorities))
+
+  def task(self, i):
+    task = Task(self.types[self.tcodes[i]], (self.xs[i], self.ys[i]), self.costs[i], self.steps[i])
+    task.priority = int(self.priorities[i])
+    return task, self.pcosts[i]
+
+class CrowdingTracker:
+  # planned units per tile for the next track_len steps, directly on tile and in its 3x3 (side sap) neighbourhood
+
+  side_deltas = np.array([ (dx, dy) for dx in [-1, 0, 1] for dy in [-1, 0, 1] if (dx, dy) != (0, 0) ])
+  dir_deltas = np.array([ dir2delta[d] for d in range(5) ])
+
+  def __init__(self, track_len):
+    self.track_len = track_len
+    # padded by one tile so 3x3 stamps never fall off the map
+    self.units = np.zeros((track_len, 26, 26), dtype=np.int16)
+    self.side_units = np.zeros((track_len, 26, 26), dtype=np.int16)
+    self.grid = np.zeros((track_len, 24, 24)) # units + side units * sap dropoff
+    self.sdoff = 0
+
+  def reset(self, sdoff):
+    self.units[:] = 0
+    self.side_units[:] = 0
+    self.grid[:] = 0
+    self.sdoff = sdoff
+
+  def add_path(self, pos, path):
+    # path positions from step 0, path shorter than track_len stays at its end
+    dirs = np.zeros(self.track_len, dtype=np.int32)
+    dirs[1:len(path)+1] = path[:self.track_len-1]
+    positions = np.array(pos) + self.dir_deltas[dirs].cumsum(axis=0)
+    self._stamp(np.arange(self.track_len), positions)
+
+  def add_unit(self, pos):
+    # unit staying at pos this step
+    self._stamp(np.zeros(1, dtype=np.int32), np.array([ pos ]))
+
+  def _stamp(self, dsteps, positions):
+    x, y = positions[:, 0] + 1, positions[:, 1] + 1
+    sdsteps = np.repeat(dsteps, len(self.side_deltas))
+    sx = (x[:, None] + self.side_deltas[:, 0]).ravel()
+    sy = (y[:, None] + self.side_deltas[:, 1]).ravel()
+    # indices are unique as there is one position per step
+    self.units[dsteps, x, y] += 1
+    self.side_units[sdsteps, sx, sy] += 1
+    self.grid[dsteps] = self.units[dsteps, 1:-1, 1:-1] + self.side_units[dsteps, 1:-1, 1:-1] * self.sdoff
+
+  def crowding(self, pos, dstep):
+    if dstep >= self.track_len:
+      return 0
+    return self.grid.item(dstep, pos[0], pos[1])
+
+  def crowding_at(self, xs, ys, dsteps):
+    return np.where(dsteps < self.track_len, self.grid[np.minimum(dsteps, self.track_len-1), xs, ys], 0)
+
 class TaskManager:
 
   def __init__(self, agent, env_cfg):
     self.agent = agent
     self.maxdelsteps = 2
     self.track_len = 30
+    self.tracker = CrowdingTracker(self.track_len)
     def sort_deltas(x, y):
       if x < 12 and y < 12:
         if x < y:
@@ -56,18 +157,28 @@ class TaskManager:
           return [ (-1, 0), (0, 1), (0, -1), (1, 0) ]
 
     self.ord_deltas = { (x,y): sort_deltas(x, y) for x in range(24) for y in range(24) }
+    self._reset_counters()
 
   def update(self, obs):
-    pass
+    self._reset_counters()
+
+  def _reset_counters(self):
+    self.counters = dict.fromkeys(search_counters, 0) # turn totals
+    self.unit_counters = dict() # uid -> { counter -> count }
+
+  def _count(self, unit, **counts):
+    if unit.id not in self.unit_counters:
+      self.unit_counters[unit.id] = dict.fromkeys(search_counters, 0)
+    ucounters = self.unit_counters[unit.id]
+    for name, n in counts.items():
+      ucounters[name] += n
+      self.counters[name] += n
 
   def estimate_cost(self, pos, dstep):
-    return self.agent.env.unit_move_cost - self.agent.env.tot_tile_energy(pos, dstep)
+    return self.agent.env.move_cost(pos, dstep)
 
   def _sap_tasks(self, unit):
-    sap_positions = []
-    for dsap in self.unit_saps[unit.id]:
-      sp = self.agent.tactics._evaluate_sap(unit, dsap, self.opp_units_ene, self.opp_units_ram)        
-      sap_positions.append((dsap, sp))
+    sap_positions = zip(self.unit_saps[unit.id], self.agent.tactics.sapengine.evaluate_all(unit, self.unit_saps[unit.id]))
     sap_positions = [ s for s in sap_positions if s[1] >= 100 ]
     self.unit_saps[unit.id] = [ dsap for dsap, _ in sap_positions ]
     return sap_positions
@@ -85,7 +196,7 @@ class TaskManager:
       tasks.add(Task.BACKUP)
     if self.agent.strategy.needs_exploring(pos) and self.agent.env.is_my_half(pos) and pos not in self.exploring:
       tasks.add(Task.EXPLORE)
-    if pos in self.agent.strategy.high_ground and pos not in self.recharging:
+    if self.agent.strategy.high_ground[pos] > 0 and pos not in self.recharging:
       tasks.add(Task.RECHARGE)
     elif self.agent.env.tot_tile_energy(pos, steps) >= 0 or self.agent.env.tot_tile_energy(pos, steps) >= self.agent.env.tot_tile_energy(unit.pos, steps):
       tasks.add(Task.IMPROVE)
@@ -96,93 +207,99 @@ class TaskManager:
       return False
     if steps < 5 and not self.agent.tactics.is_safe(pos, unit.energy-cost):
       return False
-    if steps in self.probing and pos != self.probing[steps] and self.agent.env.is_unknown_fragment(pos):
-      return False
     return True
 
-  def heap_fix_up(self, pq, i):
-    while i > 0:
-      p = (i-1) // 2
-      if pq[i] < pq[p]:
-        pq[i], pq[p] = pq[p], pq[i]
-        i = p
-      else:
-        break
+  def _state(self, pos, steps):
+    return (min(steps, self.maxdelsteps) * 24 + pos[0]) * 24 + pos[1]
+
+  def _expand(self, unit, pos, cost, steps, delays):
+    # crowding and probing independent part of node expansion: [ (state, item, path cost, unknown fragment) ]
+    edges = []
+    if unit.energy - cost < self.agent.env.unit_move_cost: # can't move further
+      return edges
+    # insert delays
+    if delays < 1 and steps < self.maxdelsteps:
+      ac = self.estimate_cost(pos, steps+1) - self.agent.env.unit_move_cost # doesn't move
+      if self._valid_tile(unit, pos, cost+ac, steps+1):
+        pcost = self.agent.strategy.path_cost(cost+ac, steps+1)
+        edges.append((self._state(pos, steps+1), (pos, cost+ac, steps+1, delays+1), pcost, self.agent.env.is_unknown_fragment(pos)))
+    # expand neighbours  
+    x, y = pos
+    for dx, dy in self.ord_deltas[pos]:
+      nx, ny, nt = x+dx, y+dy, steps+1
+      if self.agent.env.on_map((nx, ny)) and self.agent.env.passable((nx, ny), nt):
+        ac = self.estimate_cost((nx, ny), nt)
+        if not self._valid_tile(unit, (nx, ny), cost+ac, nt):
+          continue
+        pcost = self.agent.strategy.path_cost(cost+ac, nt)
+        edges.append((self._state((nx, ny), nt), ((nx, ny), cost+ac, nt, delays), pcost, self.agent.env.is_unknown_fragment((nx, ny))))
+    return edges
 
   def _search_tasks(self, unit):
-    found = [] # (dest, cost, steps, tasks)
-    hpqcnt = 0
+    # expansions are cached per unit for the turn, re-searches only add up crowding and check probing again
+    found = [] # (dest, cost, steps, tasks, path_cost)
+    if unit.id not in self.expansions:
+      self.expansions[unit.id] = dict()
+    expansions = self.expansions[unit.id] # (pos, cost, steps, delays) -> edges
+    popped = relaxed = expanded = reused = 0
+    horizon = self._search_horizon()
     # current pos cost
     ac = self.estimate_cost(unit.pos, 0) - self.agent.env.unit_move_cost # doesn't move
     pcost = self.agent.strategy.path_cost(ac, 0)
     pcost += self.agent.strategy.path_crowding(unit.pos, 0)
-    pq = [ (pcost, 0, unit.pos, 0, 0, 0) ] # (path_cost, heap_cnt, pos, energy_cost, steps, delays)
-    visited = { (unit.pos, 0): None } # (pos, dt) -> parent
+    pq = PathQueue()
+    parents = [ -2 ] * ((self.maxdelsteps + 1) * 24 * 24) # state (pos, min(dt, maxdelsteps)) -> parent state, -1 for root
+    parents[self._state(unit.pos, 0)] = -1
+    pq.push(pcost, unit.pos, 0, 0, 0)
     tasks_pos = set() # to avoid refinding same task with different delays
     while len(pq) > 0:
-      npcost, _, pos, cost, steps, delays = heapq.heappop(pq)
+      npcost, _, pos, cost, steps, delays = pq.pop()
+      popped += 1
+      if popped & 255 == 0:
+        self.agent.budget.check("search")
+      item = (pos, cost, steps, delays)
+      node = self._state(pos, steps)
       if pos not in tasks_pos:
         tasks_pos.add(pos)        
         vtasks = self._valid_tasks(unit, pos, cost, steps)
         found.append((pos, cost, steps, vtasks, npcost))
-      if unit.energy - cost < self.agent.env.unit_move_cost: # can't move further
+      if horizon is not None and steps >= horizon:
         continue
-      # insert delays
-      if delays < 1 and steps < self.maxdelsteps:
-        ac = self.estimate_cost(pos, steps+1) - self.agent.env.unit_move_cost # doesn't move
-        if self._valid_tile(unit, pos, cost+ac, steps+1):
-          pcost = self.agent.strategy.path_cost(cost+ac, steps+1)
-          pcost += self.agent.strategy.path_crowding(pos, steps+1)
-          hpqcnt += 1
-          node = (pcost, hpqcnt, pos, cost+ac, steps+1, delays+1)
-          if (pos, steps+1) not in visited:
-            heapq.heappush(pq, node)
-            visited[pos, steps+1] = (pos, steps)
-          else: # update neighbours
-            for i, (pc, hpc, p, _, ont, dly) in enumerate(pq):
-              if pos == p and dly == delays and ont >= steps:
-                pcost = self.agent.strategy.path_cost(cost+ac, steps+1)
-                pcost += self.agent.strategy.path_crowding(pos, steps+1)            
-                if pcost < pc:
-                  pq[i] = (pcost, hpc, pos, cost+ac, steps+1, delays)
-                  #heapq.heapify(pq)
-                  self.heap_fix_up(pq, i)
-                  visited[pos, min(steps+1, self.maxdelsteps)] = (pos, min(steps, self.maxdelsteps))
-                break
-      # expand neighbours  
-      x, y = pos
-      for dx, dy in self.ord_deltas[pos]:
-        nx, ny, nt = x+dx, y+dy, steps+1
-        if self.agent.env.on_map((nx, ny)) and self.agent.env.passable((nx, ny), nt):
-          ac = self.estimate_cost((nx, ny), nt)
-          if not self._valid_tile(unit, (nx, ny), cost+ac, nt):
-            continue
-          if ((nx, ny), min(nt, self.maxdelsteps)) not in visited:
-            pcost = self.agent.strategy.path_cost(cost+ac, nt)
-            pcost += self.agent.strategy.path_crowding((nx, ny), nt)
-            hpqcnt += 1
-            node = (pcost, hpqcnt, (nx, ny), cost+ac, nt, delays)
-            heapq.heappush(pq, node)
-            visited[(nx, ny), min(nt, self.maxdelsteps)] = ((x, y), min(steps, self.maxdelsteps))
-          else: # update neighbours
-            for i, (pc, hpc, p, _, ont, dly) in enumerate(pq):
-              if (nx, ny) == p and dly == delays and ont >= steps:
-                pcost = self.agent.strategy.path_cost(cost+ac, nt)
-                pcost += self.agent.strategy.path_crowding((nx, ny), nt)            
-                if pcost < pc:
-                  pq[i] = (pcost, hpc, (nx, ny), cost+ac, nt, delays)
-                  heapq.heapify(pq)
-                  visited[(nx, ny), min(nt, self.maxdelsteps)] = ((x, y), min(steps, self.maxdelsteps))
-                break
-    return found, visited
-
-  def _recover_path(self, node, visited):
+      if item in expansions:
+        reused += 1
+      else:
+        expansions[item] = self._expand(unit, pos, cost, steps, delays)
+        expanded += 1
+      for state, nitem, pcost, unknown in expansions[item]:
+        npos, ncost, nt, ndelays = nitem
+        if unknown and nt in self.probing and npos != self.probing[nt]: # unknown fragment probed by other unit
+          continue
+        pcost += self.agent.strategy.path_crowding(npos, nt)
+        relaxed += 1
+        if parents[state] == -2: # not seen yet
+          parents[state] = node
+          pq.push(pcost, npos, ncost, nt, ndelays)
+        elif pq.decrease(npos, delays, steps, pcost, ncost, nt): # queued entry keeps its delays
+          parents[state] = node
+    self._count(unit, searches=1, popped=popped, relaxed=relaxed, reordered=pq.nreordered, expanded=expanded, reused=reused)
+    return found, parents
+
+  def _search_horizon(self):
+    # unbounded while at least half of the turn budget is left, shorter paths as it runs out
+    left = self.agent.budget.fraction_left()
+    if left > 0.5:
+      return None
+    if left > 0.25:
+      return 20
+    return 10 if left > 0 else 5
+
+  def _recover_path(self, node, parents):
     path = []
-    while visited[node] is not None:
-      (x, y), _ = node
-      (xp, yp), _ = visited[node]
+    while parents[node] >= 0:
+      parent = parents[node]
+      (x, y), (xp, yp) = divmod(node % (24 * 24), 24), divmod(parent % (24 * 24), 24)
       path = [ delta2dir[x-xp, y-yp] ] + path
-      node = visited[node]
+      node = parent
     return path
 
   def _reset_coordination(self):
@@ -194,30 +311,19 @@ class TaskManager:
     self.nexplorers = 0
     self.ncollectors = 0
     self.nfragments = self.agent.env.nfragments()
-    self.opp_units_ram = set()
-    self.opp_units_ene = { unit.id: unit.energy for unit in self.agent.unitman.all_visible_units(self.agent.opp_team_id) }
-    self.track_units = [ dict() for _ in range(self.track_len) ] # dstep -> { pos -> nunits }   
-    self.track_side_units = [ dict() for _ in range(self.track_len) ] # dstep -> { pos -> nunits in 3x3 }   
+    self.agent.tactics.sapengine.reset()
+    self.tracker.reset(self.agent.env.unit_sap_dropoff_factor)
+    self.expansions = dict() # uid -> search expansions cache
+    self.assigned = set() # uids with task set this turn
 
   def crowding(self, pos, dstep):
-    if dstep >= self.track_len:
-      return 0
-    c = self.track_units[dstep][pos] if pos in self.track_units[dstep] else 0
-    s = self.track_side_units[dstep][pos] if pos in self.track_side_units[dstep] else 0
-    return c + s * self.agent.env.unit_sap_dropoff_factor 
+    return self.tracker.crowding(pos, dstep)
 
   def _track_no_task(self, unit):
+    self.assigned.add(unit.id)
     if self.agent.env.is_unknown_fragment(unit.pos):
       self.probing[0] = unit.pos
-    for p in pos_to_3x3[unit.pos]:
-      if p == unit.pos:
-        if p not in self.track_units[0]:
-          self.track_units[0][p] = 0
-        self.track_units[0][p] += 1
-      else:
-        if p not in self.track_side_units[0]:
-          self.track_side_units[0][p] = 0
-        self.track_side_units[0][p] += 1
+    self.tracker.add_unit(unit.pos)
 
   def _track_path(self, pos, path):
     # coordinate probing for fragments 
@@ -228,43 +334,21 @@ class TaskManager:
       if self.agent.env.is_unknown_fragment(upos):
         self.probing[dstep+1] = upos
     # crowding
-    path = [ 0 ] + path
-    path = path[:self.track_len]
-    if len(path) < self.track_len:
-      path = path + [ 0 ] * (self.track_len - len(path))
-    upos = pos
-    for dstep, ddir in enumerate(path):
-      delta = dir2delta[ddir]
-      upos = upos[0] + delta[0], upos[1] + delta[1]
-      for p in pos_to_3x3[upos]:
-        if p == upos:
-          if p not in self.track_units[dstep]:
-            self.track_units[dstep][p] = 0
-          self.track_units[dstep][p] += 1
-        else:
-          if p not in self.track_side_units[dstep]:
-            self.track_side_units[dstep][p] = 0
-          self.track_side_units[dstep][p] += 1
-  
+    self.tracker.add_path(pos, path)
+
   def _precalculate(self, free_uids):
     self.unit_saps = dict()
     for uid in free_uids:
-      unit = self.agent.unitman.my_unit(uid)
-      sap_positions = []
-      for dx in range(-self.agent.env.unit_sap_range, self.agent.env.unit_sap_range+1):
-        for dy in range(-self.agent.env.unit_sap_range, self.agent.env.unit_sap_range+1):
-          x, y = unit.pos[0] + dx, unit.pos[1] + dy
-          if self.agent.env.on_map((x, y)) and self.agent.tactics.sap_potential((x,y)) > 0:
-            sap_positions.append((dx, dy))
-      self.unit_saps[uid] = sap_positions
+      self.unit_saps[uid] = self.agent.tactics.sapengine.targets(self.agent.unitman.my_unit(uid))
 
   def _start_task(self, unit, task, path):
+    self.assigned.add(unit.id)
     unit.set_task(task, path)
     self._track_path(unit.pos, path)
     if task.type == Task.SAP:
       if self.agent.env.is_fragment(unit.pos): # sapping from fragment
         self.collecting.add(unit.pos)
-      self.agent.tactics._apply_sap(unit, task.pos, self.opp_units_ene)
+      self.agent.tactics.sapengine.apply_sap(unit, task.pos)
     elif task.type == Task.EXPLORE:
       for p in pos_to_srange[self.agent.env.unit_sensor_range][task.pos]:
         self.exploring.add(p)
@@ -287,31 +371,30 @@ class TaskManager:
     # track rammed units
     if task.steps <= 7:
       for u in self.agent.unitman.visible_units_on(task.pos, self.agent.opp_team_id):
-        self.opp_units_ram.add(u.id)
-    debug(f"{unit}: {task} {''.join([dir2str[d] for d in path])}\n")
+        self.agent.tactics.sapengine.ram(u.id)
+    log.debug(lambda: f"{unit}: {task} {''.join([dir2str[d] for d in path])}\n")
 
   def _generate_tasks(self, unit):
-    tasks = []
+    cands = Candidates()
     if self.agent.tactics.can_sap(unit):
       for dsap, sp in self._sap_tasks(unit):
-        task = Task(Task.SAP, dsap, sp, 0)
-        task.priority = self.agent.strategy.priority(unit, task)
-        tasks.append((task, 0))
-    found, visited = self._search_tasks(unit)
+        cands.add(Task.SAP, dsap, sp, 0, 0)
+    found, parents = self._search_tasks(unit)
     for dest, cost, steps, vtasks, pcost in found:
       for ttype in (vtasks & self.allowed_tasks):
-        task = Task(ttype, dest, cost, steps)
-        task.priority = self.agent.strategy.priority(unit, task)
-        tasks.append((task, pcost))
-    return tasks, visited
+        cands.add(ttype, dest, cost, steps, pcost)
+    if len(cands) > 0:
+      cands.score(unit, self.agent.strategy)
+    self._count(unit, candidates=len(cands))
+    return cands, parents
 
   def _top_task(self, unit):
-    tasks_list, visited = self._generate_tasks(unit)
+    cands, parents = self._generate_tasks(unit)
     #if unit.id in { 4, 7 } and self.agent.env.step in { 50 }:
-    #debug(f"{unit} tasks {sorted(tasks_list, key=lambda t: t[0].priority, reverse=True)}\n")
-    if len(tasks_list) > 0:
-      task, pcost = max(tasks_list, key=lambda t: t[0].priority)
-      path = [] if task.type == Task.SAP else self._recover_path((task.pos, min(task.steps, self.maxdelsteps)), visited)
+    #log.debug(f"{unit} tasks {sorted((cands.task(i)[0] for i in range(len(cands))), key=lambda t: t.priority, reverse=True)}\n")
+    if len(cands) > 0:
+      task, pcost = cands.task(cands.best())
+      path = [] if task.type == Task.SAP else self._recover_path(self._state(task.pos, task.steps), parents)
       return task, path, pcost
     return None, [], 0
   
@@ -343,7 +426,7 @@ class TaskManager:
 
   def _still_valid(self, unit, task):
     if task.type == Task.SAP:
-      sp = self.agent.tactics._evaluate_sap(unit, task.pos, self.opp_units_ene, self.opp_units_ram)
+      sp = self.agent.tactics.sapengine.evaluate(unit, task.pos)
       return sp >= task.cost
     return task.type in (self._valid_tasks(unit, task.pos, task.cost, task.steps) & self.allowed_tasks)    
 
@@ -360,6 +443,7 @@ class TaskManager:
     hpc = 0
     unit_queue = []
     for uid in free_uids:
+      self.agent.budget.check("assign")
       unit = self.agent.unitman.my_unit(uid)
       top_task, top_path, top_cost = self._top_task(unit)
       if top_task is not None:
@@ -369,16 +453,29 @@ class TaskManager:
       else:  
         unit.set_task(None)
         self._track_no_task(unit)
-        debug(f"{unit} without task\n")
+        log.debug("{} without task\n", unit)
     # assign tasks in order of priority
     while len(unit_queue) > 0:
       #if self.agent.env.step in { 21 }:
-      # debug(f"uq={unit_queue}\n")
+      # log.debug(f"uq={unit_queue}\n")
+      self.agent.budget.check("assign")
       _, _, unit, task, path, pcost = heapq.heappop(unit_queue)
-      if self._still_valid(unit, task) and (task.type == Task.SAP or self._check_path(unit, path, pcost)):
+      valid = self._still_valid(unit, task)
+      if valid and (task.type == Task.SAP or self._check_path(unit, path, pcost)):
         self._start_task(unit, task, path)
+      elif self.agent.budget.left() <= 0:
+        # out of turn budget, no more re-planning: valid tasks keep their path, invalid ones are dropped
+        if valid:
+          self._count(unit, kept=1)
+          self._start_task(unit, task, path)
+        else:
+          self._count(unit, dropped=1)
+          unit.set_task(None)
+          self._track_no_task(unit)
+          log.debug("{} without task\n", unit)
       else:
         # task not valid or path cost changed, recalculate top task for this unit and push back to queue
+        self._count(unit, invalidated=int(not valid), rerouted=int(valid))
         top_task, top_path, top_cost = self._top_task(unit)
         if top_task is not None:
           item = (-top_task.priority, hpc, unit, top_task, top_path, top_cost)
@@ -387,7 +484,18 @@ class TaskManager:
         else:  
           unit.set_task(None)
           self._track_no_task(unit)
-          debug(f"{unit} without task\n")
+          log.debug("{} without task\n", unit)
+    log.debug("searches={} expanded={} reused={}\n", self.counters["searches"], self.counters["expanded"], self.counters["reused"])
+
+  def fallback_tasks(self, free_uids):
+    # after an aborted assignment, units without a task set this turn continue their previous task and path
+    for uid in free_uids:
+      unit = self.agent.unitman.my_unit(uid)
+      if uid in self.assigned:
+        continue
+      if unit.task is not None and unit.task.type == Task.SAP: # sap target has moved on
+        unit.set_task(None)
+      log.warning("{} fallback {} {}\n", unit, unit.task, unit.path)
 
   def cstatus(self):
     s = "Crowding:\n"
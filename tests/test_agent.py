@@ -0,0 +1,37 @@
+import os
+import numpy as np
+from agent import Agent
+from budget import TimeBudget
+from replay import load_turns
+from task_manager import Task
+
+recording = os.path.join(os.path.dirname(__file__), "data", "player_0_seed1.jsonl.gz")
+
+def test_overrun_falls_back_to_previous_tasks(monkeypatch):
+  # plan normally for 20 turns, then hit the hard deadline at the first budget check of the next turn
+  player, env_cfg, nsteps, turns = load_turns(recording)
+  agent = Agent(player, env_cfg, budget_enabled=False)
+  for step, obs, remaining, _ in turns:
+    if step == 20:
+      break
+    agent.act(step, obs, remaining)
+  units = [ agent.unitman.my_unit(uid) for uid in agent.unitman.live_units() ]
+  sapper = units[0]
+  sapper.set_task(Task(Task.SAP, (1, 0), 0, 0))
+  previous = { unit.id: (unit.task, list(unit.path)) for unit in units }
+  monkeypatch.setattr(TimeBudget, "act_timeout", 1e-6)
+  agent.budget.enabled = True
+  actions = agent.act(step, obs, 0) # no overage left, the hard limit is act_timeout
+  assert actions.shape == (env_cfg["max_units"], 3) and actions.dtype.kind == "i"
+  assert "assign after" in agent.profiler.last["overrun"]
+  assert sapper.task is None and actions[sapper.id].tolist() == [ 0, 0, 0 ]
+  nmoving = 0
+  for unit in units[1:]:
+    task, path = previous[unit.id]
+    assert unit.task is task
+    if unit.id not in agent.unitman.live_units():
+      continue
+    expected = path[0] if task is not None and unit.pos != task.pos and len(path) > 0 else 0
+    assert actions[unit.id].tolist() == [ expected, 0, 0 ]
+    nmoving += expected != 0
+  assert nmoving > 0
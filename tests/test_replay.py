@@ -0,0 +1,24 @@
+import os
+from agent import Agent
+from observation import ObservationView
+from recorder import Recorder, load_recording
+from episode_store import convert_recording
+from replay import replay
+
+recording = os.path.join(os.path.dirname(__file__), "data", "player_0_seed1.jsonl.gz")
+
+def test_replay_recording_and_episode(tmp_path):
+  # record the current agent on the fixture observations, both formats must replay to the same actions
+  player, env_cfg, records = load_recording(recording)
+  agent = Agent(player, env_cfg, budget_enabled=False)
+  view = ObservationView()
+  recorder = Recorder(str(tmp_path), player, env_cfg)
+  for r in records:
+    actions = agent.act(r["step"], view.reset(r["obs"]), r["remainingOverageTime"])
+    recorder.record(r["step"], r["obs"], r["remainingOverageTime"], actions.tolist())
+  recorder.close()
+  episode_dir = str(tmp_path / "episode")
+  assert convert_recording(recorder.path, episode_dir) == len(records)
+  for path in (recorder.path, episode_dir):
+    _, nsteps, _, mismatches = replay(path, budget_enabled=False)
+    assert nsteps == len(records) and mismatches == []
@@ -0,0 +1,106 @@
+import os
+import heapq
+from agent import Agent
+from replay import load_turns
+from task_manager import TaskManager
+
+# 40 turns of simulator self-play recorded with the agent as it was before the path queue
+recording = os.path.join(os.path.dirname(__file__), "data", "player_0_seed1.jsonl.gz")
+
+def heap_fix_up(pq, i):
+  while i > 0:
+    p = (i-1) // 2
+    if pq[i] < pq[p]:
+      pq[i], pq[p] = pq[p], pq[i]
+      i = p
+    else:
+      break
+
+def reference_search(self, unit):
+  # task search as it was before the path queue: tuple heap, visited dict and a scan of the queue for updates
+  def valid_tile(pos, cost, steps):
+    if steps in self.probing and pos != self.probing[steps] and self.agent.env.is_unknown_fragment(pos):
+      return False
+    return self._valid_tile(unit, pos, cost, steps)
+  found = [] # (dest, cost, steps, tasks)
+  hpqcnt = 0
+  # current pos cost
+  ac = self.estimate_cost(unit.pos, 0) - self.agent.env.unit_move_cost # doesn't move
+  pcost = self.agent.strategy.path_cost(ac, 0)
+  pcost += self.agent.strategy.path_crowding(unit.pos, 0)
+  pq = [ (pcost, 0, unit.pos, 0, 0, 0) ] # (path_cost, heap_cnt, pos, energy_cost, steps, delays)
+  visited = { (unit.pos, 0): None } # (pos, dt) -> parent
+  tasks_pos = set() # to avoid refinding same task with different delays
+  while len(pq) > 0:
+    npcost, _, pos, cost, steps, delays = heapq.heappop(pq)
+    if pos not in tasks_pos:
+      tasks_pos.add(pos)
+      vtasks = self._valid_tasks(unit, pos, cost, steps)
+      found.append((pos, cost, steps, vtasks, npcost))
+    if unit.energy - cost < self.agent.env.unit_move_cost: # can't move further
+      continue
+    # insert delays
+    if delays < 1 and steps < self.maxdelsteps:
+      ac = self.estimate_cost(pos, steps+1) - self.agent.env.unit_move_cost # doesn't move
+      if valid_tile(pos, cost+ac, steps+1):
+        pcost = self.agent.strategy.path_cost(cost+ac, steps+1)
+        pcost += self.agent.strategy.path_crowding(pos, steps+1)
+        hpqcnt += 1
+        node = (pcost, hpqcnt, pos, cost+ac, steps+1, delays+1)
+        if (pos, steps+1) not in visited:
+          heapq.heappush(pq, node)
+          visited[pos, steps+1] = (pos, steps)
+        else: # update neighbours
+          for i, (pc, hpc, p, _, ont, dly) in enumerate(pq):
+            if pos == p and dly == delays and ont >= steps:
+              if pcost < pc:
+                pq[i] = (pcost, hpc, pos, cost+ac, steps+1, delays)
+                heap_fix_up(pq, i)
+                visited[pos, min(steps+1, self.maxdelsteps)] = (pos, min(steps, self.maxdelsteps))
+              break
+    # expand neighbours
+    x, y = pos
+    for dx, dy in self.ord_deltas[pos]:
+      nx, ny, nt = x+dx, y+dy, steps+1
+      if self.agent.env.on_map((nx, ny)) and self.agent.env.passable((nx, ny), nt):
+        ac = self.estimate_cost((nx, ny), nt)
+        if not valid_tile((nx, ny), cost+ac, nt):
+          continue
+        pcost = self.agent.strategy.path_cost(cost+ac, nt)
+        pcost += self.agent.strategy.path_crowding((nx, ny), nt)
+        hpqcnt += 1
+        if ((nx, ny), min(nt, self.maxdelsteps)) not in visited:
+          heapq.heappush(pq, (pcost, hpqcnt, (nx, ny), cost+ac, nt, delays))
+          visited[(nx, ny), min(nt, self.maxdelsteps)] = ((x, y), min(steps, self.maxdelsteps))
+        else: # update neighbours
+          for i, (pc, hpc, p, _, ont, dly) in enumerate(pq):
+            if (nx, ny) == p and dly == delays and ont >= steps:
+              if pcost < pc:
+                pq[i] = (pcost, hpc, (nx, ny), cost+ac, nt, delays)
+                heapq.heapify(pq)
+                visited[(nx, ny), min(nt, self.maxdelsteps)] = ((x, y), min(steps, self.maxdelsteps))
+              break
+  return found, visited
+
+def test_search_matches_reference(monkeypatch):
+  search = TaskManager._search_tasks
+  nsearches = 0
+  def checked_search(self, unit):
+    nonlocal nsearches
+    ref_found, visited = reference_search(self, unit)
+    found, parents = search(self, unit)
+    assert found == ref_found
+    ref_parents = [ -2 ] * len(parents)
+    for node, parent in visited.items():
+      ref_parents[self._state(*node)] = -1 if parent is None else self._state(*parent)
+    assert parents == ref_parents
+    nsearches += 1
+    return found, parents
+  monkeypatch.setattr(TaskManager, "_search_tasks", checked_search)
+  player, env_cfg, nsteps, turns = load_turns(recording)
+  agent = Agent(player, env_cfg, budget_enabled=False)
+  reordered = 0
+  for step, obs, remaining, _ in turns:
+    agent.act(step, obs, remaining)
+    reordered += agent.taskman.counters["reordered"]
+  assert nsearches > 0 and reordered > 0 # decreases were exercised
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+from simulator import Simulator, EMPTY, ASTEROID, W, H
+
+@pytest.mark.parametrize("seed", [ 0, 1, 2 ])
+def test_full_game_scores_every_match(seed):
+  sim = Simulator(seed)
+  rng = np.random.default_rng(seed)
+  while not sim.done:
+    actions = np.zeros((2, sim.max_units, 3), dtype=np.int64)
+    actions[..., 0] = rng.integers(0, 6, (2, sim.max_units))
+    actions[..., 1:] = rng.integers(-3, 4, (2, sim.max_units, 2))
+    sim.apply(actions)
+    obs = sim.observe(0)
+    # match k is scored in the step from 101k + 100, its units stay visible until the next step
+    assert obs["match_steps"] == sim.step % (sim.max_steps_in_match + 1)
+    assert obs["team_wins"].sum() == sim.step // (sim.max_steps_in_match + 1)
+  assert sim.step == sim.nsteps == 505
+  assert sim.wins.sum() == sim.match_count
+
+def bare_sim(**params):
+  # empty map without drift, energy field, relics or spawns, in the middle of the first match
+  p = dict(nebula_tile_drift_speed=0.0, energy_node_drift_speed=0.0, unit_energy_void_factor=0.0, nebula_tile_energy_reduction=0,
+           unit_move_cost=2, unit_sap_cost=40, unit_sap_range=4, unit_sap_dropoff_factor=0.5)
+  p.update(params)
+  sim = Simulator(0, **p)
+  sim.base_tiles[:] = EMPTY
+  sim._set_tiles(0)
+  sim._fields = { 0: np.zeros((W, H), dtype=np.int64) }
+  sim.relic_schedule[:] = sim.nsteps
+  sim.spawn_rate = sim.nsteps
+  sim.step = sim.match_steps = 1
+  return sim
+
+def place(sim, team, uid, pos, energy):
+  sim.alive[team, uid] = True
+  sim.pos[team, uid] = pos
+  sim.energy[team, uid] = energy
+
+def step(sim, orders):
+  # orders: (team, uid) -> [ action, dx, dy ], other units stay
+  actions = np.zeros((2, sim.max_units, 3), dtype=np.int64)
+  for (team, uid), order in orders.items():
+    actions[team, uid] = order
+  sim.apply(actions)
+
+def test_moves_cost_energy_and_asteroids_block():
+  sim = bare_sim()
+  sim.base_tiles[7, 5] = ASTEROID
+  sim._set_tiles(0)
+  place(sim, 0, 0, (5, 5), 100)
+  place(sim, 0, 1, (0, 9), 100)
+  place(sim, 0, 2, (9, 9), 1) # not enough energy
+  step(sim, { (0, 0): [ 2, 0, 0 ], (0, 1): [ 4, 0, 0 ], (0, 2): [ 1, 0, 0 ] })
+  assert sim.pos[0, 0].tolist() == [ 6, 5 ] and sim.energy[0, 0] == 98
+  assert sim.pos[0, 1].tolist() == [ 0, 9 ] and sim.energy[0, 1] == 98 # off map moves are paid like the engine does
+  assert sim.pos[0, 2].tolist() == [ 9, 9 ] and sim.energy[0, 2] == 1
+  step(sim, { (0, 0): [ 2, 0, 0 ] })
+  assert sim.pos[0, 0].tolist() == [ 6, 5 ] and sim.energy[0, 0] == 98
+
+def test_sap_hits_target_and_adjacent_tiles_with_dropoff():
+  sim = bare_sim()
+  place(sim, 0, 0, (5, 5), 100)
+  place(sim, 1, 0, (8, 5), 100) # target
+  place(sim, 1, 1, (9, 6), 100) # adjacent
+  place(sim, 1, 2, (10, 5), 100) # out of the 3x3
+  step(sim, { (0, 0): [ 5, 3, 0 ] })
+  assert sim.energy[0, 0] == 60
+  assert sim.energy[1].tolist()[:3] == [ 60, 80, 100 ]
+  step(sim, { (0, 0): [ 5, 5, 0 ] }) # out of sap range
+  assert sim.energy[0, 0] == 60 and sim.energy[1, 0] == 60
+
+def test_energy_void_drains_adjacent_opponents():
+  sim = bare_sim(unit_energy_void_factor=0.25)
+  place(sim, 0, 0, (5, 5), 100)
+  place(sim, 1, 0, (6, 5), 40)
+  place(sim, 1, 1, (6, 5), 40)
+  step(sim, {})
+  # 0.25 of the adjacent opponent energy, split among the units on the tile
+  assert sim.energy[0, 0] == 80
+  assert sim.energy[1].tolist()[:2] == [ 28, 28 ]
+
+def test_points_only_on_relic_fragments():
+  sim = bare_sim()
+  sim.fragment_masks[:] = False
+  sim.fragment_masks[0, 10, 10] = True
+  sim.relic_schedule[0] = 0
+  place(sim, 0, 0, (10, 10), 100)
+  place(sim, 0, 1, (10, 10), 100) # same tile scores once
+  place(sim, 0, 2, (11, 10), 100)
+  place(sim, 1, 0, (3, 3), 100)
+  step(sim, {})
+  assert sim.points.tolist() == [ 1, 0 ]
+  assert (sim.relic_nodes()[:, 0] >= 0).tolist() == [ True, False, False, True, False, False ] # first pair and its mirror
+
+def test_units_spawn_every_spawn_rate_steps():
+  sim = Simulator(0)
+  z = np.zeros((2, sim.max_units, 3), dtype=np.int64)
+  for s in range(1, 11):
+    sim.apply(z)
+    assert sim.alive.sum(1).tolist() == [ (s + 2) // sim.spawn_rate ] * 2
+  assert sim.pos[0, sim.alive[0]].tolist() == [ [ 0, 0 ] ] * 4
+  assert sim.pos[1, sim.alive[1]].tolist() == [ [ W - 1, H - 1 ] ] * 4
+
+def test_nebula_and_energy_nodes_drift_on_schedule():
+  sim = Simulator(0, nebula_tile_drift_speed=-0.1, energy_node_drift_speed=0.05)
+  z = np.zeros((2, sim.max_units, 3), dtype=np.int64)
+  tiles, changed = sim.tiles().copy(), []
+  for s in range(1, 46):
+    sim.apply(z)
+    if not np.array_equal(sim.tiles(), tiles):
+      changed.append(s)
+      assert np.array_equal(sim.tiles(), np.roll(tiles, (-1, 1), axis=(0, 1)))
+      tiles = sim.tiles().copy()
+    # the observed field is the one units gained from in the last step
+    assert sim.map_energy is sim._fields[int(sim.node_drifts[s - 1])]
+  assert changed == [ 1, 11, 21, 31, 41 ]
+  assert [ s for s in range(1, 46) if sim.node_drifts[s] != sim.node_drifts[s - 1] ] == [ 1, 21, 41 ]
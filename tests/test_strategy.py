@@ -0,0 +1,93 @@
+import os
+from agent import Agent
+from replay import load_turns
+from task_manager import Candidates, Task
+from utils import center
+
+# 45 turns of simulator self-play (seed 6), fragments, relic contact and saps show up from step 19 on
+recording = os.path.join(os.path.dirname(__file__), "data", "player_0_sim6.jsonl.gz")
+
+def reference_priority(self, unit, task):
+  # Strategy.priority of the baseline, reads env, unitman and tactics directly instead of the compiled tables
+  steps_factor = 10 #10 
+  crowd_factor = 30 #30
+  if task.type == Task.LEAVE:
+    prior = 2000
+    prior -= task.cost
+    prior -= steps_factor * task.steps
+  elif task.type == Task.SAP:
+    prior = 500 
+    sappot = task.cost # actually sap value
+    prior += sappot + (unit.energy // 5)
+  elif task.type == Task.EXPLORE:
+    prior = 500
+    prior -= task.cost
+    prior -= steps_factor * task.steps
+    # small or no effect
+    #age = self.agent.env.step - self.agent.env.last_seen(task.pos) # tile last seen
+    #age = min(20, age)
+    #prior += 2*age
+  elif task.type == Task.RECHARGE:
+    prior = 500 - 20
+    prior -= task.cost
+    prior -= steps_factor * task.steps
+    prior -= crowd_factor * self.agent.taskman.crowding(task.pos, task.steps)
+    prior += 3 * (50 - self.agent.env.match_step())
+    fisr = self.high_ground[task.pos]
+    prior += 20 * fisr # number of fragments in sap range
+    if not self.agent.env.is_confirmed_fragment(unit.pos) and task.steps <= 7 and self.agent.env.in_sap_range(task.pos, unit.pos):
+      ounits = [ u for u in self.agent.unitman.opp_visible_units() if u.pos == task.pos and u.energy >= 0 ]
+      if len(ounits) > 0 and sum(u.energy for u in ounits) < unit.energy - task.cost - 20: 
+        prior += 150 # ram opp units
+    prior += (200 - unit.energy)
+  elif task.type == Task.COLLECT or task.type == Task.BACKUP:
+    prior = 500
+    prior -= task.cost
+    prior -= steps_factor * task.steps
+    prior -= crowd_factor * self.agent.taskman.crowding(task.pos, task.steps)
+    prior += 100 if task.pos in self.myfrags else 0
+    if task.steps <= 7 and self.agent.env.in_sap_range(task.pos, unit.pos):
+      ounits = [ u for u in self.agent.unitman.opp_visible_units() if u.pos == task.pos and u.energy >= 0 ]
+      if len(ounits) > 0 and sum(u.energy for u in ounits) < unit.energy - task.cost - 20: 
+        prior += 150# ram opp units
+    uenergy = (10 - unit.energy // 40) if unit.pos == task.pos else 0 # keep unit with lowest energy on fragment
+    prior += uenergy
+    if self.agent.env.is_confirmed_fragment(task.pos) and self.agent.env.tot_tile_energy(task.pos, task.steps) > 0:
+      tenergy = self.agent.env.tot_tile_energy(task.pos, task.steps) # tile energy
+      prior += 5 * tenergy
+    if task.type == Task.BACKUP and task.steps == 1: # assure backup gets picked before collect
+      prior += crowd_factor * self.agent.taskman.crowding(task.pos, task.steps)
+      prior += task.cost + steps_factor * task.steps + 11
+  elif task.type == Task.IMPROVE:
+    prior = 0
+    prior -= task.cost
+    prior -= steps_factor * task.steps
+    prior -= crowd_factor * self.agent.taskman.crowding(task.pos, task.steps)
+    ediff = self.agent.env.tot_tile_energy(task.pos, task.steps) - self.agent.env.tot_tile_energy(unit.pos, 0)
+    nsteps = 10 - min(10, task.steps)
+    prior += nsteps * ediff
+    pos = (1 + abs(task.pos[0] - center[0])) * (1 + abs(task.pos[1] - center[1]))
+    prior -= 5 * pos
+
+  if (task.type == Task.SAP or unit.pos == task.pos) and not self.agent.tactics.is_safe(unit.pos, unit.energy):
+    prior -= 1000 # about to get rammed
+
+  #if self.agent.taskman.task_kept(unit, task):
+  #  prior += 5 # slightly prefer continuing old task
+  return int(prior)
+
+def test_priorities_match_reference(monkeypatch):
+  score = Candidates.score
+  ntypes = dict() # task type -> candidates checked
+  def checked_score(self, unit, strategy):
+    score(self, unit, strategy)
+    for i in range(len(self)):
+      task, _ = self.task(i)
+      assert task.priority == reference_priority(strategy, unit, task), task
+      ntypes[task.type] = ntypes.get(task.type, 0) + 1
+  monkeypatch.setattr(Candidates, "score", checked_score)
+  player, env_cfg, nsteps, turns = load_turns(recording)
+  agent = Agent(player, env_cfg, budget_enabled=False)
+  for step, obs, remaining, _ in turns:
+    agent.act(step, obs, remaining)
+  assert set(ntypes) >= { Task.SAP, Task.COLLECT, Task.BACKUP, Task.EXPLORE, Task.IMPROVE, Task.RECHARGE }, ntypes
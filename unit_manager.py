@@ -1,9 +1,13 @@
 import numpy as np
 from random import choice
 from task_manager import Task
-from utils import debug, dir2str, pos_to_plus, pos_to_3x3, manhattan, max_distance
+from history import History
+from utils import Logger, dir2str, manhattan, max_distance, ids_to_mask, mask_to_ids
+
+log = Logger("unitman")
 
 class Unit:
+  __slots__ = ("agent", "id", "pos", "energy", "task", "path", "last_pos", "last_energy", "old_task", "task_step")
 
   def __init__(self, agent, id, pos, energy):
     self.agent = agent
@@ -58,18 +62,20 @@ class UnitManager:
     self.agent = agent
     self.units = (dict(), dict()) # unit ids for both players id -> Unit
     self.dead_units = set()
-    self.vis_units_history = [] # visible units history 
+    self.vis_units_history = History(self.agent.env.history_len, visible=((2,), np.uint16)) # visible unit ids bitmasks history
+    self.visible_uids = (set(), set()) # visible unit ids at current step
     self.positions = (dict(), dict())
+    self._index_units()
 
   def update(self, obs):
     if self.agent.env.is_reset_step():
       self.units = (dict(), dict())
-      self.vis_units_history = []
-      debug("unitman match reset\n")
+      self.vis_units_history.clear()
+      log.info("unitman match reset\n")
     # update units
-    unit_mask = np.array(obs["units_mask"]) # shape (2, max_units, )
-    unit_positions = np.array(obs["units"]["position"]) # shape (2, max_units, 2)
-    unit_energys = np.array(obs["units"]["energy"]) # shape (2, max_units, 1)
+    unit_mask = np.asarray(obs["units_mask"]) # shape (2, max_units, )
+    unit_positions = np.asarray(obs["units"]["position"]) # shape (2, max_units, 2)
+    unit_energys = np.asarray(obs["units"]["energy"]) # shape (2, max_units, 1)
     available_unit_ids = [ np.where(unit_mask[0])[0], np.where(unit_mask[1])[0] ]
     visible_units = (set(), set())
     self.positions = (dict(), dict())
@@ -86,57 +92,103 @@ class UnitManager:
           self.units[team_id][uid].update_position(pos)
           self.units[team_id][uid].update_energy(energy)
         self.positions[team_id][pos] = self.units[team_id][uid]
-        # estimate nebula energy reduction (TODO: don't assume no void/sap loss)
-        if not self.agent.env.nebula_enred_known:
-          self._infer_ner(team_id, uid)
+    # estimate nebula energy reduction
+    if not self.agent.env.nebula_enred_known:
+      self._infer_ner([ self.units[team_id][int(uid)] for team_id in [ 0, 1 ] for uid in available_unit_ids[team_id] ])
     # append to history
-    self.vis_units_history.append(visible_units)
+    self.visible_uids = visible_units
+    self.vis_units_history.push(self.agent.env.step, visible=[ ids_to_mask(visible_units[0]), ids_to_mask(visible_units[1]) ])
     # record casualties and remove them from units
     self._casualties()
-
-  def _infer_ner(self, team_id, uid):
-    unit = self.units[team_id][uid]
-    if unit.last_pos is not None and unit.last_energy > 0 and unit.last_energy < 400 and unit.energy > 0 and unit.energy < 400:
-      if unit.pos != unit.last_pos and (not self.agent.env.drift_detected or self.agent.env.drift_speed_known) and self.agent.env.is_last_nebula_tile(unit.pos):
-        cost = self.agent.env.unit_move_cost - self.agent.env.tile_energy(unit.pos)          
-        ner = (unit.last_energy - unit.energy) - cost
-        self.agent.env.set_nebula_energy_reduction(ner)
-      if unit.pos == unit.last_pos and (not self.agent.env.drift_detected or self.agent.env.drift_speed_known) and self.agent.env.is_last_nebula_tile(unit.pos):
-        cost = -self.agent.env.tile_energy(unit.pos)
-        ner = (unit.last_energy - unit.energy) - cost
-        self.agent.env.set_nebula_energy_reduction(ner)
-
-  def all_visible_units(self, team_id):
-    return [ unit for unit in self.units[team_id].values() if unit.id in self.vis_units_history[-1][team_id] ]
+    self._index_units()
+
+  def _index_units(self):
+    # visible units and their occupancy for this turn
+    self.visible_units = tuple([ unit for unit in self.units[team_id].values() if unit.id in self.visible_uids[team_id] ] for team_id in [ 0, 1 ])
+    self.live_uids = { unit.id for unit in self.visible_units[self.agent.team_id] if unit.energy >= 0 }
+    occupancy = np.zeros((2, 26, 26), dtype=np.uint16) # uids bitmask, padded by one tile
+    self.live_count = np.zeros((2, 24, 24), dtype=np.int64) # units with energy >= 0 on tile
+    self.live_energy = np.zeros((2, 24, 24), dtype=np.int64)
+    for team_id in [ 0, 1 ]:
+      if len(self.visible_units[team_id]) == 0:
+        continue
+      xs, ys = np.array([ unit.pos for unit in self.visible_units[team_id] ]).T
+      uids = np.array([ unit.id for unit in self.visible_units[team_id] ])
+      energies = np.array([ unit.energy for unit in self.visible_units[team_id] ])
+      np.bitwise_or.at(occupancy[team_id], (xs+1, ys+1), (1 << uids).astype(np.uint16))
+      live = energies >= 0
+      np.add.at(self.live_count[team_id], (xs[live], ys[live]), 1)
+      np.add.at(self.live_energy[team_id], (xs[live], ys[live]), energies[live])
+    self.occupancy = occupancy[:, 1:-1, 1:-1]
+    self.occupancy_plus = np.zeros((2, 24, 24), dtype=np.uint16)
+    self.occupancy_3x3 = np.zeros((2, 24, 24), dtype=np.uint16)
+    for dx in [ -1, 0, 1 ]:
+      for dy in [ -1, 0, 1 ]:
+        shifted = occupancy[:, 1+dx:25+dx, 1+dy:25+dy]
+        self.occupancy_3x3 |= shifted
+        if abs(dx) + abs(dy) <= 1:
+          self.occupancy_plus |= shifted
+
+  def _units_in(self, team_id, mask):
+    units = []
+    while mask:
+      low = mask & -mask
+      units.append(self.units[team_id][low.bit_length() - 1])
+      mask ^= low
+    return units
+
+  def _infer_ner(self, units):
+    # nebula energy reduction from energy changes of units on nebula tiles (TODO: don't assume no void/sap loss)
+    if self.agent.env.drift_detected and not self.agent.env.drift_speed_known:
+      return
+    units = [ unit for unit in units if unit.last_pos is not None ]
+    if len(units) == 0:
+      return
+    xs, ys = np.array([ unit.pos for unit in units ]).T
+    energy = np.array([ unit.energy for unit in units ])
+    last_energy = np.array([ unit.last_energy for unit in units ])
+    moved = np.array([ unit.pos != unit.last_pos for unit in units ])
+    valid = (last_energy > 0) & (last_energy < 400) & (energy > 0) & (energy < 400) & self.agent.env.last_nebula_mask()[xs, ys]
+    cost = np.where(moved, self.agent.env.unit_move_cost, 0) - self.agent.env.tile_energies[xs, ys]
+    ner = (last_energy - energy) - cost
+    self.agent.env.set_nebula_energy_reduction(ner[valid])
+
+  def all_visible_units(self, team_id): # cached, don't modify
+    return self.visible_units[team_id]
 
   def visible_units_on(self, pos, team_id):
-    return [ unit for unit in self.all_visible_units(team_id) if unit.pos == pos ]
+    return self._units_in(team_id, self.occupancy[team_id].item(pos))
 
   def visible_units_on_plus(self, pos, team_id):
-    return [ unit for unit in self.all_visible_units(team_id) if unit.pos in pos_to_plus[pos] ]
+    return self._units_in(team_id, self.occupancy_plus[team_id].item(pos))
 
   def visible_units_on_3x3(self, pos, team_id):
-    return [ unit for unit in self.all_visible_units(team_id) if unit.pos in pos_to_3x3[pos] ]
+    return self._units_in(team_id, self.occupancy_3x3[team_id].item(pos))
+
+  def visible_ids(self, team_id, back=0):
+    if back == 0:
+      return self.visible_uids[team_id]
+    return mask_to_ids(self.vis_units_history.latest("visible", back)[team_id])
 
   def my_unit(self, uid):
     return self.units[self.agent.team_id][uid]
 
-  def opp_visible_units(self):
-    return [ unit for unit in self.units[self.agent.opp_team_id].values() if unit.id in self.vis_units_history[-1][self.agent.opp_team_id] ]
+  def opp_visible_units(self): # cached, don't modify
+    return self.visible_units[self.agent.opp_team_id]
 
   def opp_unit(self, uid):
     return self.units[self.agent.opp_team_id][uid]
   
-  def live_units(self):
-    return { unit.id for unit in self.all_visible_units(self.agent.team_id) if unit.energy >= 0 }
+  def live_units(self): # cached, don't modify
+    return self.live_uids
 
   def _casualties(self):
     # TODO: ignoring units respawning at the next turn
     self.dead_units = set()
     if len(self.vis_units_history) < 2:
       return     
-    for uid in (self.vis_units_history[-2][self.agent.team_id] - self.vis_units_history[-1][self.agent.team_id]):
+    for uid in (self.visible_ids(self.agent.team_id, 1) - self.visible_ids(self.agent.team_id)):
       u = self.units[self.agent.team_id].pop(uid)
       self.dead_units.add(u.pos)
-      debug(f"{uid} dead\n")
+      log.debug("{} dead\n", uid)
     
\ No newline at end of file
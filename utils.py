@@ -1,20 +1,79 @@
 import sys, os
+import numpy as np
+
+DEBUG, INFO, WARNING, OFF = 10, 20, 30, 100
+log_levels = dict(debug=DEBUG, info=INFO, warning=WARNING, off=OFF)
+
+def parse_level(name, default, var):
+  # unknown level names fall back to default with a warning instead of failing at import
+  level = log_levels.get(name.strip().lower())
+  if level is None:
+    default_name = next(n for n, l in log_levels.items() if l == default)
+    sys.stderr.write(f"{var}: unknown log level {name!r}, using {default_name}\n")
+    return default
+  return level
+
+# LUX_LOG sets the default level, LUX_LOG_MODULES overrides it per module, e.g. "taskman=off,env=info"
+log_level = parse_level(os.environ.get("LUX_LOG", "debug"), DEBUG, "LUX_LOG")
+module_levels = { m.strip(): parse_level(l, log_level, "LUX_LOG_MODULES") for m, _, l in
+  (s.partition("=") for s in os.environ.get("LUX_LOG_MODULES", "").split(",") if s.strip()) }
+log_to_file = os.path.exists("C:\\") # debug.txt on windows, stderr otherwise
+log_buffer = []
+loggers = dict()
+
+def _noop(*args):
+  pass
+
+class Logger:
+  # per module logger, messages are formatted only when their level is enabled and buffered until flush_debug
+
+  def __init__(self, module):
+    self.module = module
+    loggers[module] = self
+    self.set_level(module_levels.get(module, log_level))
+
+  def set_level(self, level):
+    # disabled levels are bound to a no-op, a call then costs only its argument evaluation
+    self.level = level
+    self.debug = self._write if level <= DEBUG else _noop
+    self.info = self._write if level <= INFO else _noop
+    self.warning = self._write if level <= WARNING else _noop
+
+  def _write(self, s, *args):
+    # s is a format string for args or a callable returning the message
+    if args:
+      s = s.format(*args)
+    elif callable(s):
+      s = s()
+    log_buffer.append(s)
+
+def set_log_level(level, module=None):
+  global log_level
+  if module is not None:
+    module_levels[module] = level
+    if module in loggers:
+      loggers[module].set_level(level)
+    return
+  log_level = level
+  for m, logger in loggers.items():
+    logger.set_level(module_levels.get(m, level))
 
 def init_debug():
-  if os.path.exists("C:\\"): 
-    with open("debug.txt", "wt") as fd:
-      fd.write("Debug started\n")
-      fd.flush()
-  else:
-    sys.stderr.write("Debug started\n")
-
-def debug(s):
-  if os.path.exists("C:\\"): 
-    with open("debug.txt", "at") as fd:
-      fd.write(s)
-      fd.flush()
-  else:
-    sys.stderr.write(s)
+  if log_level < OFF:
+    if log_to_file:
+      open("debug.txt", "wt").close()
+    log_buffer.append("Debug started\n")
+
+def flush_debug():
+  # called once at the end of each turn
+  if len(log_buffer) > 0:
+    s = "".join(log_buffer)
+    log_buffer.clear()
+    if log_to_file:
+      with open("debug.txt", "at") as fd:
+        fd.write(s)
+    else:
+      sys.stderr.write(s)
 
 center = (12, 12)
 
@@ -23,6 +82,25 @@ spawn_points = [ (0, 0), (23, 23) ]
 def mirror(pos):
   return (23-pos[1], 23-pos[0])
 
+def mirror_grid(grid):
+  return grid[::-1, ::-1].T
+
+def box_sum(grid, r):
+  # sum over (2r+1)x(2r+1) square around each cell (clipped at map border) from summed-area table
+  w, h = grid.shape
+  sat = np.zeros((w+1, h+1), dtype=np.int32)
+  sat[1:, 1:] = grid.cumsum(0).cumsum(1)
+  x0, x1 = np.clip(np.arange(w) - r, 0, w), np.clip(np.arange(w) + r + 1, 0, w)
+  y0, y1 = np.clip(np.arange(h) - r, 0, h), np.clip(np.arange(h) + r + 1, 0, h)
+  return sat[np.ix_(x1, y1)] - sat[np.ix_(x0, y1)] - sat[np.ix_(x1, y0)] + sat[np.ix_(x0, y0)]
+
+def ids_to_mask(ids):
+  return sum(1 << uid for uid in ids)
+
+def mask_to_ids(mask):
+  mask = int(mask)
+  return { uid for uid in range(16) if mask >> uid & 1 }
+
 dir2str = { 0: "C", 1: "U", 2: "R", 3: "D", 4: "L", 5: "S" }
 
 dir2delta = { 0: (0,0), 1: (0,-1), 2: (1,0), 3: (0,1), 4: (-1,0), 5: (0,0) }